@@ -3,6 +3,7 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from config.settings import get_config
 from config.database import db_instance
+from config.logging_config import configure_logging
 import os
 
 # Import blueprints
@@ -34,6 +35,7 @@ def create_app():
     # Load configuration
     config = get_config()
     app.config.from_object(config)
+    configure_logging(config.LOG_LEVEL)
 
     # Enable CORS
     CORS(app, origins=config.CORS_ORIGINS, supports_credentials=True)
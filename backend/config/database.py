@@ -29,6 +29,7 @@ class Database:
                 config.MONGODB_URI,
                 maxPoolSize=config.MONGODB_MAX_POOL_SIZE,
                 minPoolSize=config.MONGODB_MIN_POOL_SIZE,
+                waitQueueTimeoutMS=config.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
                 serverSelectionTimeoutMS=5000
             )
 
@@ -90,7 +91,7 @@ class Database:
             return False
 
 
-# Create singleton instance
+# Create singleton instance; every service shares this client and its pool
 db_instance = Database()
 db = db_instance.db
 gridfs = db_instance.fs
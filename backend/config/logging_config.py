@@ -0,0 +1,37 @@
+"""Application logging setup"""
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
+_listener = None
+
+
+def configure_logging(level: str = 'INFO') -> None:
+    """
+    Route all log records through a queue so request threads never block on stderr
+
+    A QueueListener thread formats and writes the records. Safe to call more
+    than once; only the first call installs handlers.
+
+    Args:
+        level: Root logger level name
+    """
+    global _listener
+
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level.upper())
+    root.addHandler(QueueHandler(log_queue))
@@ -5,13 +5,25 @@ Manages vendor bids for procurements
 """
 
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from bson import ObjectId
 
 
 class BidModel:
     """Model for procurement bids"""
 
+    # Average technical plus average financial score, from the running sums
+    TOTAL_SCORE_STAGE = {
+        '$set': {
+            'total_score': {
+                '$add': [
+                    {'$divide': ['$technical_score_sum', '$evaluation_count']},
+                    {'$divide': ['$financial_score_sum', '$evaluation_count']}
+                ]
+            }
+        }
+    }
+
     @staticmethod
     def create_schema(procurement_id: str, vendor_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -55,6 +67,9 @@ class BidModel:
             'status': 'submitted',  # submitted, under_evaluation, qualified, disqualified, awarded, rejected
             'disqualification_reason': None,
             'evaluations': [],  # List of evaluator scores
+            'technical_score_sum': 0,
+            'financial_score_sum': 0,
+            'evaluation_count': 0,
             'total_score': None,
             'rank': None,
             'submitted_at': now,
@@ -88,6 +103,63 @@ class BidModel:
             'evaluated_at': datetime.utcnow(),
         }
 
+    @staticmethod
+    def evaluation_update(evaluation: Dict[str, Any], now: datetime) -> List[Dict[str, Any]]:
+        """
+        Build a pipeline update that appends an evaluation and refreshes total_score
+
+        Bids evaluated before the running sums existed are seeded from
+        their evaluations array.
+
+        Args:
+            evaluation: Evaluation document from evaluation_schema
+            now: Update timestamp
+
+        Returns:
+            Aggregation pipeline for update_one
+        """
+        evaluations = {'$ifNull': ['$evaluations', []]}
+
+        return [
+            {
+                '$set': {
+                    'technical_score_sum': {
+                        '$add': [
+                            {'$ifNull': ['$technical_score_sum', {'$sum': '$evaluations.technical_score'}]},
+                            evaluation['technical_score']
+                        ]
+                    },
+                    'financial_score_sum': {
+                        '$add': [
+                            {'$ifNull': ['$financial_score_sum', {'$sum': '$evaluations.financial_score'}]},
+                            evaluation['financial_score']
+                        ]
+                    },
+                    'evaluation_count': {
+                        '$add': [{'$ifNull': ['$evaluation_count', {'$size': evaluations}]}, 1]
+                    },
+                    'evaluations': {'$concatArrays': [evaluations, [{'$literal': evaluation}]]},
+                    'status': 'under_evaluation',
+                    'updated_at': now
+                }
+            },
+            BidModel.TOTAL_SCORE_STAGE
+        ]
+
+    @staticmethod
+    def running_scores_backfill() -> List[Dict[str, Any]]:
+        """Pipeline update computing the running sums and total_score from evaluations"""
+        return [
+            {
+                '$set': {
+                    'technical_score_sum': {'$sum': '$evaluations.technical_score'},
+                    'financial_score_sum': {'$sum': '$evaluations.financial_score'},
+                    'evaluation_count': {'$size': '$evaluations'}
+                }
+            },
+            BidModel.TOTAL_SCORE_STAGE
+        ]
+
     @staticmethod
     def validate_bid(data: Dict[str, Any]) -> tuple[bool, Optional[str]]:
         """
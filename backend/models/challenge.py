@@ -1,4 +1,5 @@
 """Challenge data models for skill assessments"""
+import random
 from datetime import datetime
 from typing import Dict, List, Optional
 from bson import ObjectId
@@ -72,6 +73,9 @@ class ChallengeModel:
             'is_active': data.get('is_active', True),
             'is_public': data.get('is_public', True),
 
+            # Uniform random key for indexed random selection
+            'rand': random.random(),
+
             # Timestamps
             'created_at': now,
             'updated_at': now
@@ -98,40 +102,49 @@ class ChallengeModel:
         }
 
     @staticmethod
-    def update_usage_stats(challenge: Dict, score: int, completion_time_minutes: int) -> Dict:
+    def usage_stats_update(score: int, completion_time_minutes: int) -> List[Dict]:
         """
-        Update challenge usage statistics after someone takes it
+        Build a pipeline update that folds one attempt into the usage stats
+
+        The running averages are computed server-side from the stored
+        values, so concurrent attempts cannot overwrite each other.
 
         Args:
-            challenge: Challenge record
             score: Score achieved
             completion_time_minutes: Time taken
 
         Returns:
-            Updated metadata
+            Aggregation pipeline for update_one
         """
-        metadata = challenge.get('metadata', {})
-        times_used = metadata.get('times_used', 0)
-        avg_score = metadata.get('average_score', 0)
-        avg_time = metadata.get('average_completion_time', 0)
-        pass_rate = metadata.get('pass_rate', 0)
-
-        # Calculate new averages
-        new_times_used = times_used + 1
-        new_avg_score = ((avg_score * times_used) + score) / new_times_used
-        new_avg_time = ((avg_time * times_used) + completion_time_minutes) / new_times_used
-
-        # Update pass rate (score >= 70 is passing)
-        passed = 1 if score >= 70 else 0
-        total_passed = (pass_rate * times_used / 100) + passed
-        new_pass_rate = (total_passed / new_times_used) * 100
+        times_used = {'$ifNull': ['$metadata.times_used', 0]}
+        new_times_used = {'$add': [times_used, 1]}
+
+        def running_average(field: str, value: float) -> Dict:
+            return {
+                '$round': [
+                    {
+                        '$divide': [
+                            {'$add': [{'$multiply': [{'$ifNull': [field, 0]}, times_used]}, value]},
+                            new_times_used
+                        ]
+                    },
+                    2
+                ]
+            }
 
-        return {
-            'times_used': new_times_used,
-            'average_score': round(new_avg_score, 2),
-            'average_completion_time': round(new_avg_time, 2),
-            'pass_rate': round(new_pass_rate, 2)
-        }
+        # Pass rate is a percentage; score >= 70 is passing
+        passed = 100 if score >= 70 else 0
+
+        return [{
+            '$set': {
+                'metadata.times_used': new_times_used,
+                'metadata.average_score': running_average('$metadata.average_score', score),
+                'metadata.average_completion_time': running_average(
+                    '$metadata.average_completion_time', completion_time_minutes
+                ),
+                'metadata.pass_rate': running_average('$metadata.pass_rate', passed)
+            }
+        }]
 
     @staticmethod
     def validate_skill(skill: str) -> bool:
@@ -58,7 +58,8 @@ class ProcurementModel:
             },
             'created_at': now,
             'updated_at': now,
-            'created_by': data.get('created_by')
+            'created_by': data.get('created_by'),
+            'creator_department': data.get('creator_department')
         }
 
     @staticmethod
@@ -1,5 +1,6 @@
 """User data models and business logic"""
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List
 import bcrypt
 
@@ -14,12 +15,13 @@ class UserModel:
     VALID_USER_TYPES = ['learner', 'employer', 'educator', 'admin']
 
     @staticmethod
-    def create_schema(data: Dict) -> Dict:
+    def create_schema(data: Dict, password_hash: str = None) -> Dict:
         """
         Create user record schema
 
         Args:
             data: User data
+            password_hash: Optional precomputed hash of data['password'] (skips bcrypt)
 
         Returns:
             Validated user record
@@ -28,7 +30,7 @@ class UserModel:
 
         return {
             'email': data.get('email'),
-            'password_hash': UserModel.hash_password(data.get('password')),
+            'password_hash': password_hash or UserModel.hash_password(data.get('password')),
             'full_name': data.get('full_name'),
             'role': data.get('role', 'public'),
             'department': data.get('department', ''),
@@ -57,6 +59,23 @@ class UserModel:
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def seed_password_hash(password: str) -> str:
+        """
+        Hash each distinct password once per process, for seed scripts only
+
+        Every user seeded with the same password shares one salt, so this
+        must never be used for real accounts.
+
+        Args:
+            password: Plain text password
+
+        Returns:
+            Hashed password
+        """
+        return UserModel.hash_password(password)
+
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
         """
@@ -160,15 +160,18 @@ def batch_explain_procurements():
         if not procurement_ids or len(procurement_ids) > 10:
             return error_response('Provide 1-10 procurement IDs', status_code=400)
 
-        explanations = []
+        published = []
         for proc_id in procurement_ids:
             procurement = procurement_service.get_procurement_by_id(proc_id)
             if procurement and procurement.get('status') == 'published':
-                explanation = ai_service.explain_procurement(procurement)
-                explanations.append({
-                    'procurement_id': proc_id,
-                    'explanation': explanation
-                })
+                published.append((proc_id, procurement))
+
+        # Gemini calls run concurrently instead of one after another
+        results = ai_service.explain_procurements_bulk([p for _, p in published])
+        explanations = [
+            {'procurement_id': proc_id, 'explanation': explanation}
+            for (proc_id, _), explanation in zip(published, results)
+        ]
 
         return success_response({
             'count': len(explanations),
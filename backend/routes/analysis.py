@@ -46,6 +46,41 @@ def analyze_procurement(procurement_id):
         return error_response('Failed to analyze procurement', status_code=500)
 
 
+@analysis_bp.route('/anomaly/batch', methods=['POST'])
+@token_required
+@role_required('admin', 'procurement_officer', 'auditor')
+def analyze_procurements_batch():
+    """Trigger anomaly detection for several procurements at once"""
+    try:
+        data = request.get_json() or {}
+        procurement_ids = data.get('procurement_ids', [])
+
+        if not procurement_ids or len(procurement_ids) > 20:
+            return error_response('Provide 1-20 procurement IDs', status_code=400)
+
+        # Gemini calls run concurrently and results are written in bulk
+        result = anomaly_service.detect_and_create_anomalies_batch(procurement_ids)
+
+        if result.get('error'):
+            return not_found_response('Procurement')
+
+        for item in result['results']:
+            audit_service.log_procurement_action(
+                procurement_id=item['procurement_id'],
+                action='analyze_anomalies',
+                changes={'risk_score': item['risk_score'], 'anomalies_created': item['anomalies_created']}
+            )
+
+        return success_response(
+            result,
+            message='Analysis completed successfully'
+        )
+
+    except Exception as e:
+        print(f"Error analyzing procurements: {e}")
+        return error_response('Failed to analyze procurements', status_code=500)
+
+
 @analysis_bp.route('/anomalies', methods=['GET'])
 @token_required
 def list_anomalies():
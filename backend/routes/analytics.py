@@ -7,6 +7,7 @@ Endpoints for advanced analytics and reporting
 from flask import Blueprint, request, jsonify
 from middleware.auth import token_required, role_required
 from services.analytics_service import analytics_service
+from services.audit_service import audit_service
 from utils.response import success_response, error_response
 
 analytics_bp = Blueprint('analytics', __name__)
@@ -124,6 +125,26 @@ def get_department_analysis():
         return error_response(f'Failed to retrieve department analysis: {str(e)}', 500)
 
 
+@analytics_bp.route('/audit/users/<user_id>/activity', methods=['GET'])
+@token_required
+@role_required(['admin', 'auditor'])
+def get_user_activity_summary(user_id):
+    """
+    Get a user's daily audit event counts from the daily rollup
+    Query params: days (default: 30)
+    """
+    try:
+        days = request.args.get('days', 30, type=int)
+        summary = audit_service.get_user_activity_summary(user_id, days=days)
+
+        return success_response(
+            data=summary,
+            message='User activity summary retrieved successfully'
+        )
+    except Exception as e:
+        return error_response(f'Failed to retrieve user activity summary: {str(e)}', 500)
+
+
 @analytics_bp.route('/status/distribution', methods=['GET'])
 @token_required
 def get_status_distribution():
@@ -39,7 +39,7 @@ def create_application():
         existing = db.job_applications.find_one({
             'job_id': data['job_id'],
             'user_id': g.user_id
-        })
+        }, {'_id': 1})
 
         if existing:
             return error_response('You have already applied to this job', status_code=409)
@@ -30,7 +30,7 @@ def register():
             return validation_error_response({'email': 'Invalid email format'})
 
         # Check if user already exists
-        existing_user = db.users.find_one({'email': data['email'].lower()})
+        existing_user = db.users.find_one({'email': data['email'].lower()}, {'_id': 1})
         if existing_user:
             return error_response('Email already registered', status_code=409)
 
@@ -11,7 +11,7 @@ challenges_bp = Blueprint('challenges', __name__)
 def get_challenges():
     """
     Get challenges with optional filtering
-    Query params: skill, difficulty_level, challenge_type, page, per_page
+    Query params: skill, difficulty_level, challenge_type, page, per_page, include_total
     """
     try:
         skill = request.args.get('skill')
@@ -19,13 +19,15 @@ def get_challenges():
         challenge_type = request.args.get('challenge_type')
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
+        include_total = request.args.get('include_total', 'true').lower() == 'true'
 
         result = challenge_service.get_challenges(
             skill=skill,
             difficulty_level=difficulty_level,
             challenge_type=challenge_type,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            include_total=include_total
         )
 
         return success_response(
@@ -89,12 +91,13 @@ def get_random_challenge():
 def search_challenges():
     """
     Search challenges by title/description
-    Query params: q (search term), page, per_page
+    Query params: q (search term), page, per_page, include_total
     """
     try:
         search_term = request.args.get('q', '')
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
+        include_total = request.args.get('include_total', 'true').lower() == 'true'
 
         if not search_term:
             return error_response('Search term (q) is required', 400)
@@ -102,12 +105,15 @@ def search_challenges():
         result = challenge_service.search_challenges(
             search_term=search_term,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            include_total=include_total
         )
 
+        found = result['total'] if result.get('total') is not None else len(result['challenges'])
+
         return success_response(
             data=result,
-            message=f'Found {result["total"]} challenges'
+            message=f'Found {found} challenges'
         )
 
     except Exception as e:
@@ -156,6 +162,8 @@ def create_challenge(current_user):
             status_code=201
         )
 
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(f'Error creating challenge: {str(e)}', 500)
 
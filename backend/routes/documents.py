@@ -1,7 +1,6 @@
 """Document upload and management API routes"""
 from flask import Blueprint, request, g, send_file
 from werkzeug.utils import secure_filename
-import io
 from services.document_service import document_service
 from services.procurement_service import procurement_service
 from services.gemini_service import gemini_service
@@ -52,14 +51,12 @@ def upload_document():
             if not procurement:
                 return not_found_response('Procurement')
 
-        # Read file data
-        file_data = file.read()
         filename = secure_filename(file.filename)
         content_type = file.content_type or 'application/octet-stream'
 
-        # Upload to GridFS
+        # Stream upload to GridFS
         file_id = document_service.upload_document(
-            file_data=file_data,
+            file_stream=file.stream,
             filename=filename,
             content_type=content_type,
             procurement_id=procurement_id,
@@ -77,6 +74,9 @@ def upload_document():
 
         # Process with Gemini AI for document parsing
         try:
+            # Gemini takes the whole document in one request
+            file.stream.seek(0)
+            file_data = file.read()
             gemini_result = gemini_service.parse_procurement_document(file_data, content_type)
 
             # Update document with extracted data
@@ -148,31 +148,25 @@ def get_document_metadata(document_id):
 def download_document(document_id):
     """Download document file"""
     try:
-        # Get document metadata
-        metadata = document_service.get_document(document_id)
+        # Open the file; chunks are read as the response is sent
+        grid_out = document_service.open_document(document_id)
 
-        if not metadata:
+        if not grid_out:
             return not_found_response('Document')
 
-        # Get document data
-        file_data = document_service.get_document_data(document_id)
-
-        if not file_data:
-            return error_response('Failed to retrieve document data', status_code=500)
-
         # Log action
         audit_service.log_document_action(
             document_id=document_id,
             action='download',
-            filename=metadata.get('filename')
+            filename=grid_out.filename
         )
 
         # Return file
         return send_file(
-            io.BytesIO(file_data),
-            mimetype=metadata.get('content_type', 'application/octet-stream'),
+            grid_out,
+            mimetype=grid_out.content_type or 'application/octet-stream',
             as_attachment=True,
-            download_name=metadata.get('filename', 'document')
+            download_name=grid_out.filename or 'document'
         )
 
     except Exception as e:
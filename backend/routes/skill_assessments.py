@@ -100,7 +100,7 @@ def submit_assessment_code(assessment_id):
 
         # Submit code
         time_taken = data.get('time_taken_seconds', 0)
-        success = skill_assessment_service.submit_assessment_code(
+        success, submitted = skill_assessment_service.submit_assessment_code(
             assessment_id,
             data['code_submitted'],
             time_taken
@@ -111,7 +111,11 @@ def submit_assessment_code(assessment_id):
 
         # Trigger AI analysis (async in production, sync for now)
         challenge_data = data.get('challenge_data', {})
-        skill_assessment_service.analyze_with_ai(assessment_id, challenge_data)
+        skill_assessment_service.analyze_with_ai(
+            assessment_id,
+            challenge_data,
+            assessment_doc=submitted
+        )
 
         return success_response(
             message='Code submitted successfully. AI is analyzing your code...'
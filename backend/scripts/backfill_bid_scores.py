@@ -0,0 +1,29 @@
+"""Backfill running score sums and total_score on bids evaluated before they were kept"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import db
+from models.bid import BidModel
+
+
+def main():
+    """Compute the sums and total_score server-side from each bid's evaluations"""
+    try:
+        result = db.bids.update_many(
+            {'evaluations.0': {'$exists': True}, 'evaluation_count': {'$exists': False}},
+            BidModel.running_scores_backfill()
+        )
+
+        print(f"✓ Backfilled running scores on {result.modified_count} bids")
+        return True
+
+    except Exception as e:
+        print(f"✗ Error backfilling bid scores: {e}")
+        return False
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,28 @@
+"""Backfill the rand selection key on challenges created before it was added"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import db
+
+
+def main():
+    """Give every challenge without rand a uniform random value server-side"""
+    try:
+        result = db.challenges.update_many(
+            {'rand': {'$exists': False}},
+            [{'$set': {'rand': {'$rand': {}}}}]
+        )
+
+        print(f"✓ Backfilled rand on {result.modified_count} challenges")
+        return True
+
+    except Exception as e:
+        print(f"✗ Error backfilling rand: {e}")
+        return False
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
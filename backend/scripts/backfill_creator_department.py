@@ -0,0 +1,72 @@
+"""Backfill creator_department on procurements created before it was denormalized"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import db
+from services.analytics_service import analytics_service
+
+
+def main():
+    """Copy each creator's department onto their procurements in one $merge"""
+    try:
+        missing = db.procurements.count_documents({'creator_department': {'$exists': False}})
+
+        if missing == 0:
+            print("✓ All procurements already have creator_department")
+            return True
+
+        db.procurements.aggregate([
+            {'$match': {'creator_department': {'$exists': False}}},
+            {
+                # Older records may store created_by as a string
+                '$lookup': {
+                    'from': 'users',
+                    'let': {
+                        'creator_id': {
+                            '$convert': {
+                                'input': '$created_by',
+                                'to': 'objectId',
+                                'onError': None,
+                                'onNull': None
+                            }
+                        }
+                    },
+                    'pipeline': [
+                        {'$match': {'$expr': {'$eq': ['$_id', '$$creator_id']}}},
+                        {'$project': {'_id': 0, 'department': 1}}
+                    ],
+                    'as': 'creator'
+                }
+            },
+            {
+                '$project': {
+                    'creator_department': {
+                        '$ifNull': [{'$first': '$creator.department'}, None]
+                    }
+                }
+            },
+            {
+                '$merge': {
+                    'into': 'procurements',
+                    'on': '_id',
+                    'whenMatched': 'merge',
+                    'whenNotMatched': 'discard'
+                }
+            }
+        ])
+
+        analytics_service.refresh_rollups()
+
+        print(f"✓ Backfilled creator_department on {missing} procurements")
+        return True
+
+    except Exception as e:
+        print(f"✗ Error backfilling creator_department: {e}")
+        return False
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
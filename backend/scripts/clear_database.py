@@ -19,6 +19,7 @@ def confirm_action():
     print("  • skill_assessments")
     print("  • job_postings")
     print("  • audit_logs")
+    print("  • seed_meta")
     print("\n⚠️  THIS ACTION CANNOT BE UNDONE!")
     print("="*60)
 
@@ -53,7 +54,8 @@ def main():
         'challenges',
         'skill_assessments',
         'job_postings',
-        'audit_logs'
+        'audit_logs',
+        'seed_meta'
     ]
 
     total_deleted = 0
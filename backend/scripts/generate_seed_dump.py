@@ -0,0 +1,89 @@
+"""Generate a mongoimport-ready dump of the sample challenges"""
+import sys
+import os
+
+# Add parent directory to path when run as a script
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import json_util
+from models.challenge import ChallengeModel
+
+
+DUMP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seed_challenges.json')
+DIGEST_PATH = DUMP_PATH + '.sha256'
+# Bump when the dump layout changes so dumps from older layouts are regenerated
+DUMP_FORMAT = 2
+# Stamped when the dump is merged, not when it is generated
+IMPORT_TIME_FIELDS = ('created_at', 'updated_at', 'rand')
+
+
+def dump_is_current(digest: str) -> bool:
+    """Check whether the dump on disk was generated from the given content hash"""
+    if not os.path.exists(DUMP_PATH) or not os.path.exists(DIGEST_PATH):
+        return False
+
+    with open(DIGEST_PATH) as f:
+        return f.read().strip() == f"{DUMP_FORMAT}:{digest}"
+
+
+def write_dump(challenges, digest: str) -> int:
+    """
+    Serialize challenge schemas to an Extended JSON array for mongoimport
+
+    Args:
+        challenges: Sample challenge records
+        digest: Content hash of the records
+
+    Returns:
+        Number of challenges written
+    """
+    # Imported lazily so generating the dump doesn't open a DB connection
+    from services.challenge_service import ChallengeService
+
+    schemas = []
+
+    for challenge in challenges:
+        if not (ChallengeModel.validate_skill(challenge.get('skill', ''))
+                and ChallengeModel.validate_difficulty(challenge.get('difficulty_level', ''))):
+            continue
+
+        schema = ChallengeModel.create_schema(challenge)
+        for field in IMPORT_TIME_FIELDS:
+            schema.pop(field)
+        schema['content_hash'] = ChallengeService.content_hash(challenge)
+        schemas.append(schema)
+
+    with open(DUMP_PATH, 'w') as f:
+        f.write(json_util.dumps(schemas))
+
+    with open(DIGEST_PATH, 'w') as f:
+        f.write(f"{DUMP_FORMAT}:{digest}")
+
+    return len(schemas)
+
+
+def ensure_dump(challenges, digest: str) -> str:
+    """Regenerate the dump only when the challenge content has changed"""
+    if not dump_is_current(digest):
+        write_dump(challenges, digest)
+
+    return DUMP_PATH
+
+
+def main():
+    """Write the challenge dump if it is stale"""
+    from seed_challenges import SAMPLE_CHALLENGES, seed_digest
+
+    digest = seed_digest()
+
+    if dump_is_current(digest):
+        print(f"✓ Dump is up-to-date: {DUMP_PATH}")
+        return
+
+    count = write_dump(SAMPLE_CHALLENGES, digest)
+    print(f"✓ Wrote {count} challenges to {DUMP_PATH}")
+
+
+if __name__ == '__main__':
+    main()
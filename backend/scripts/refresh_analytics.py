@@ -0,0 +1,31 @@
+"""Refresh the analytics and audit rollup collections (run nightly from cron)"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.analytics_service import analytics_service
+from services.audit_service import audit_service
+
+
+def main():
+    """Recompute all procurement rollups and the recent daily audit rollup"""
+    try:
+        refreshed_at = analytics_service.refresh_rollups()
+        if refreshed_at:
+            print(f"✓ Analytics rollups refreshed at {refreshed_at.isoformat()}")
+        else:
+            print("⚠️  Analytics rollup refresh already in progress, skipped")
+
+        audit_start = audit_service.refresh_daily_rollup()
+        print(f"✓ Audit rollup refreshed from {audit_start.date().isoformat()}")
+        return True
+
+    except Exception as e:
+        print(f"✗ Error refreshing analytics rollups: {e}")
+        return False
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -17,11 +17,13 @@ import sys
 import os
 from datetime import datetime, timedelta
 import random
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from pymongo import IndexModel, WriteConcern
 from config.database import db
 from models.user import UserModel
 from models.vendor import VendorModel
@@ -97,6 +99,28 @@ PROCUREMENT_TITLES = {
     ],
 }
 
+# Lowercased titles for descriptions, computed once instead of per procurement
+PROCUREMENT_TITLES_LOWER = {
+    category: [title.lower() for title in titles]
+    for category, titles in PROCUREMENT_TITLES.items()
+}
+
+PROCUREMENT_DESCRIPTION_TEMPLATE = (
+    "Procurement of {title} for government operations. This tender includes comprehensive "
+    "requirements and specifications for delivery and implementation."
+)
+
+# Documents per insert_many call for large generated collections
+DEFAULT_BATCH_SIZE = 10_000
+
+# Risk score range for each anomaly severity
+SEVERITY_RANGES = {
+    'low': (10, 30),
+    'medium': (31, 55),
+    'high': (56, 80),
+    'critical': (81, 100),
+}
+
 ANOMALY_SCENARIOS = [
     {
         'type': 'price',
@@ -128,8 +152,11 @@ ANOMALY_SCENARIOS = [
 
 class DatabaseSeeder:
     def __init__(self):
-        self.db = db
+        # Seed data is disposable (re-run with --clear), so skip waiting on the journal.
+        # Writes stay acknowledged (w=1) because later phases read earlier inserts.
+        self.db = db.with_options(write_concern=WriteConcern(w=1, j=False))
         self.created_users = []
+        self.user_departments = {}
         self.created_vendors = []
         self.created_procurements = []
         self.created_anomalies = []
@@ -139,12 +166,50 @@ class DatabaseSeeder:
         print("🗑️  Clearing existing data...")
 
         collections = ['users', 'vendors', 'procurements', 'anomalies', 'audit_logs']
-        for collection_name in collections:
-            count = self.db[collection_name].delete_many({})
-            print(f"   Deleted {count.deleted_count} documents from {collection_name}")
+
+        # Clear collections concurrently; delete_many (not drop) keeps setup_db's indexes
+        with ThreadPoolExecutor(max_workers=len(collections)) as executor:
+            results = list(executor.map(lambda name: self.db[name].delete_many({}), collections))
+
+        for collection_name, result in zip(collections, results):
+            print(f"   Deleted {result.deleted_count} documents from {collection_name}")
 
         print("✓ Database cleared\n")
 
+    def drop_secondary_indexes(self, collections: List[str]) -> Dict[str, List[IndexModel]]:
+        """Drop non-_id indexes before a bulk load, returning their specs for rebuild"""
+        print("🔧 Dropping secondary indexes for bulk load...")
+
+        saved = {}
+        for collection_name in collections:
+            models = []
+            for index in self.db[collection_name].list_indexes():
+                if index['name'] == '_id_':
+                    continue
+                spec = dict(index)
+                keys = list(spec.pop('key').items())
+                spec.pop('v', None)
+                spec.pop('ns', None)
+                models.append(IndexModel(keys, **spec))
+
+            self.db[collection_name].drop_indexes()
+            saved[collection_name] = models
+            print(f"   Dropped {len(models)} indexes from {collection_name}")
+
+        print()
+        return saved
+
+    def rebuild_indexes(self, saved: Dict[str, List[IndexModel]]):
+        """Recreate indexes dropped by drop_secondary_indexes in one build per collection"""
+        print("🔧 Rebuilding indexes...")
+
+        for collection_name, models in saved.items():
+            if models:
+                self.db[collection_name].create_indexes(models)
+            print(f"   Rebuilt {len(models)} indexes on {collection_name}")
+
+        print()
+
     def create_users(self, count: int = 10):
         """Create test users with various roles"""
         print(f"👥 Creating {count} users...")
@@ -195,11 +260,16 @@ class DatabaseSeeder:
                 'phone': f'+25470000{i+1:04d}',
             })
 
-        for user_data in users_data:
-            user_schema = UserModel.create_schema(user_data)
-            result = self.db.users.insert_one(user_schema)
-            self.created_users.append(result.inserted_id)
-            print(f"   ✓ Created user: {user_data['email']} ({user_data['role']})")
+        user_schemas = [
+            UserModel.create_schema(user_data, password_hash=UserModel.seed_password_hash(user_data['password']))
+            for user_data in users_data
+        ]
+        result = self.db.users.insert_many(user_schemas, ordered=False)
+        self.created_users.extend(result.inserted_ids)
+        self.user_departments.update(
+            (user_id, user_data.get('department'))
+            for user_id, user_data in zip(result.inserted_ids, users_data)
+        )
 
         print(f"✓ Created {len(self.created_users)} users\n")
 
@@ -215,6 +285,15 @@ class DatabaseSeeder:
             ['consultancy'],
         ]
 
+        vendor_schemas = []
+
+        # Draw per-vendor random values in batches up front
+        tax_statuses = random.choices(['compliant', 'compliant', 'compliant', 'non_compliant', 'pending'], k=count)
+        total_contracts = [random.randint(0, 20) for _ in range(count)]
+        total_values = [random.randint(1000000, 50000000) for _ in range(count)]
+        completion_rates = [random.uniform(0.7, 1.0) for _ in range(count)]
+        average_ratings = [random.uniform(3.5, 5.0) for _ in range(count)]
+
         for i in range(count):
             vendor_name = VENDOR_NAMES[i % len(VENDOR_NAMES)]
             if i >= len(VENDOR_NAMES):
@@ -227,20 +306,22 @@ class DatabaseSeeder:
                 'phone': f'+25472000{i:04d}',
                 'address': f'{random.choice(["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret"])}, {random.randint(1, 999)} {random.choice(["Kenyatta", "Moi", "Uhuru", "Haile Selassie"])} Avenue',
                 'business_category': ', '.join(random.choice(categories_list)),
-                'tax_compliance_status': random.choice(['compliant', 'compliant', 'compliant', 'non_compliant', 'pending']),
+                'tax_compliance_status': tax_statuses[i],
             }
 
             vendor_schema = VendorModel.create_schema(vendor_data)
             # Add performance metrics
             vendor_schema['performance_metrics'] = {
-                'total_contracts': random.randint(0, 20),
-                'total_value': random.randint(1000000, 50000000),
-                'completion_rate': random.uniform(0.7, 1.0),
-                'average_rating': random.uniform(3.5, 5.0),
+                'total_contracts': total_contracts[i],
+                'total_value': total_values[i],
+                'completion_rate': completion_rates[i],
+                'average_rating': average_ratings[i],
             }
-            result = self.db.vendors.insert_one(vendor_schema)
-            self.created_vendors.append(result.inserted_id)
-            print(f"   ✓ Created vendor: {vendor_data['name']} ({vendor_data['registration_number']})")
+            vendor_schemas.append(vendor_schema)
+
+        if vendor_schemas:
+            result = self.db.vendors.insert_many(vendor_schemas, ordered=False)
+            self.created_vendors.extend(result.inserted_ids)
 
         print(f"✓ Created {len(self.created_vendors)} vendors\n")
 
@@ -251,13 +332,24 @@ class DatabaseSeeder:
         statuses = ['draft', 'published', 'evaluation', 'awarded', 'completed', 'cancelled']
         status_weights = [5, 40, 25, 15, 10, 5]  # More published/evaluation
 
+        procurement_schemas = []
+
+        # Draw per-procurement random values in batches up front
+        categories = random.choices(list(PROCUREMENT_TITLES.keys()), k=count)
+        status_draws = random.choices(statuses, weights=status_weights, k=count)
+        created_offsets = [random.randint(1, 180) for _ in range(count)]
+        estimated_values = [random.randint(500000, 50000000) for _ in range(count)]
+        departments = random.choices(DEPARTMENTS, k=count)
+        creators = random.choices(self.created_users, k=count)
+
         for i in range(count):
-            category = random.choice(list(PROCUREMENT_TITLES.keys()))
-            title = random.choice(PROCUREMENT_TITLES[category])
-            status = random.choices(statuses, weights=status_weights)[0]
+            category = categories[i]
+            title_index = random.randrange(len(PROCUREMENT_TITLES[category]))
+            title = PROCUREMENT_TITLES[category][title_index]
+            status = status_draws[i]
 
             # Generate dates based on status
-            created_date = datetime.utcnow() - timedelta(days=random.randint(1, 180))
+            created_date = datetime.utcnow() - timedelta(days=created_offsets[i])
             published_date = None
             closing_date = None
             awarded_date = None
@@ -269,7 +361,7 @@ class DatabaseSeeder:
             if status in ['awarded', 'completed']:
                 awarded_date = closing_date + timedelta(days=random.randint(7, 21))
 
-            estimated_value = random.randint(500000, 50000000)
+            estimated_value = estimated_values[i]
             awarded_value = None
             vendor_id = None
 
@@ -281,15 +373,18 @@ class DatabaseSeeder:
 
             procurement_data = {
                 'tender_number': f'PROC/{created_date.year}/T{1000 + i:04d}',
-                'title': f"{title} - {random.choice(DEPARTMENTS)}",
-                'description': f"Procurement of {title.lower()} for government operations. This tender includes comprehensive requirements and specifications for delivery and implementation.",
+                'title': f"{title} - {departments[i]}",
+                'description': PROCUREMENT_DESCRIPTION_TEMPLATE.format(
+                    title=PROCUREMENT_TITLES_LOWER[category][title_index]
+                ),
                 'category': category,
                 'estimated_value': estimated_value,
                 'currency': 'KES',
                 'status': status,
                 'published_date': published_date,
                 'deadline': closing_date,
-                'created_by': str(random.choice(self.created_users)),
+                'created_by': str(creators[i]),
+                'creator_department': self.user_departments.get(creators[i]),
                 'awarded_vendor_id': vendor_id,
                 'awarded_amount': awarded_value,
                 'awarded_date': awarded_date,
@@ -301,9 +396,11 @@ class DatabaseSeeder:
                 procurement_data['risk_score'] = random.randint(0, 100)
 
             procurement_schema = ProcurementModel.create_schema(procurement_data)
-            result = self.db.procurements.insert_one(procurement_schema)
-            self.created_procurements.append(result.inserted_id)
-            print(f"   ✓ Created procurement: {procurement_data['tender_number']} ({status})")
+            procurement_schemas.append(procurement_schema)
+
+        if procurement_schemas:
+            result = self.db.procurements.insert_many(procurement_schemas, ordered=False)
+            self.created_procurements.extend(result.inserted_ids)
 
         print(f"✓ Created {len(self.created_procurements)} procurements\n")
 
@@ -312,33 +409,31 @@ class DatabaseSeeder:
         print(f"⚠️  Creating {count} anomalies...")
 
         # Only create anomalies for awarded/completed procurements
-        eligible_procurements = [
-            p for p in self.created_procurements
-            if self.db.procurements.find_one({'_id': p, 'status': {'$in': ['awarded', 'completed']}})
-        ]
+        eligible_cursor = self.db.procurements.find(
+            {'_id': {'$in': self.created_procurements}, 'status': {'$in': ['awarded', 'completed']}},
+            {'_id': 1}
+        )
+        eligible_procurements = [doc['_id'] for doc in eligible_cursor]
 
         if not eligible_procurements:
             print("   No eligible procurements for anomalies")
             return
 
+        anomaly_schemas = []
+
         for i in range(min(count, len(eligible_procurements))):
             procurement_id = random.choice(eligible_procurements)
             scenario = random.choice(ANOMALY_SCENARIOS)
 
             # Calculate risk score based on severity
-            risk_scores = {
-                'low': random.randint(10, 30),
-                'medium': random.randint(31, 55),
-                'high': random.randint(56, 80),
-                'critical': random.randint(81, 100),
-            }
+            low, high = SEVERITY_RANGES[scenario['severity']]
 
             anomaly_data = {
                 'type': scenario['type'],
                 'severity': scenario['severity'],
                 'description': scenario['description'],
                 'reasoning': f"AI detected {scenario['type']} anomaly with {scenario['severity']} severity",
-                'risk_score': risk_scores[scenario['severity']],
+                'risk_score': random.randint(low, high),
                 'detected_pattern': scenario['type'],
             }
 
@@ -354,42 +449,74 @@ class DatabaseSeeder:
                 anomaly_schema['resolved_at'] = datetime.utcnow() - timedelta(days=random.randint(0, 10))
                 anomaly_schema['resolution_notes'] = 'Anomaly investigated and resolved. No actual issues found.'
 
-            result = self.db.anomalies.insert_one(anomaly_schema)
-            self.created_anomalies.append(result.inserted_id)
-            print(f"   ✓ Created anomaly: {scenario['type']} ({scenario['severity']}) for procurement {str(procurement_id)[:8]}...")
+            anomaly_schemas.append(anomaly_schema)
+
+        if anomaly_schemas:
+            result = self.db.anomalies.insert_many(anomaly_schemas, ordered=False)
+            self.created_anomalies.extend(result.inserted_ids)
 
         print(f"✓ Created {len(self.created_anomalies)} anomalies\n")
 
-    def create_audit_logs(self, count: int = 50):
-        """Create sample audit logs"""
+    def create_audit_logs(self, count: int = 50, batch_size: int = DEFAULT_BATCH_SIZE):
+        """Create sample audit logs, inserted in chunks of batch_size to bound memory"""
         print(f"📝 Creating {count} audit logs...")
 
+        # (event_type, action, resource_type), as AuditService.log_action records them
         actions = [
-            'user.login',
-            'user.logout',
-            'procurement.create',
-            'procurement.update',
-            'procurement.view',
-            'vendor.create',
-            'vendor.update',
-            'anomaly.flag',
-            'anomaly.resolve',
-            'document.upload',
+            ('authentication', 'login', 'user'),
+            ('authentication', 'logout', 'user'),
+            ('procurement', 'create', 'procurement'),
+            ('procurement', 'update', 'procurement'),
+            ('procurement', 'view', 'procurement'),
+            ('vendor', 'create', 'vendor'),
+            ('vendor', 'update', 'vendor'),
+            ('anomaly', 'flag', 'anomaly'),
+            ('anomaly', 'resolve', 'anomaly'),
+            ('document', 'upload', 'document'),
         ]
 
-        for i in range(count):
-            log_data = {
-                'user_id': str(random.choice(self.created_users)),
-                'action': random.choice(actions),
-                'resource_type': random.choice(['procurement', 'vendor', 'user', 'anomaly']),
-                'resource_id': str(random.choice(self.created_procurements + self.created_vendors)),
-                'details': {'method': 'POST', 'endpoint': '/api/procurement'},
-                'ip_address': f'192.168.{random.randint(1, 255)}.{random.randint(1, 255)}',
-                'user_agent': 'Mozilla/5.0 (Test Agent)',
-                'timestamp': datetime.utcnow() - timedelta(days=random.randint(0, 60)),
-            }
-
-            self.db.audit_logs.insert_one(log_data)
+        resources = {
+            'user': self.created_users,
+            'procurement': self.created_procurements,
+            'vendor': self.created_vendors,
+            'anomaly': self.created_anomalies,
+        }
+
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+
+            # Draw this chunk's random values in batches up front
+            user_ids = random.choices(self.created_users, k=size)
+            log_actions = random.choices(actions, k=size)
+            day_offsets = [random.randint(0, 60) for _ in range(size)]
+
+            logs = []
+            for i in range(size):
+                event_type, action, resource_type = log_actions[i]
+                candidates = resources.get(resource_type)
+                resource_id = str(random.choice(candidates)) if candidates else None
+
+                logs.append({
+                    'event_type': event_type,
+                    'user_id': str(user_ids[i]),
+                    'user_role': None,
+                    'resource': {
+                        'type': resource_type,
+                        'id': resource_id,
+                        'name': None
+                    },
+                    'action': action,
+                    'changes': {},
+                    'metadata': {
+                        'ip_address': f'192.168.{random.randint(1, 255)}.{random.randint(1, 255)}',
+                        'user_agent': 'Mozilla/5.0 (Test Agent)',
+                        'method': 'POST',
+                        'endpoint': f'{resource_type}.{action}'
+                    },
+                    'created_at': datetime.utcnow() - timedelta(days=day_offsets[i]),
+                })
+
+            self.db.audit_logs.insert_many(logs, ordered=False)
 
         print(f"✓ Created {count} audit logs\n")
 
@@ -411,6 +538,7 @@ class DatabaseSeeder:
         print("-"*60)
         print("\n✓ Database is ready for testing!")
         print("="*60 + "\n")
+        sys.stdout.flush()
 
 
 def main():
@@ -421,9 +549,18 @@ def main():
     parser.add_argument('--procurements', type=int, default=30, help='Number of procurements to create')
     parser.add_argument('--anomalies', type=int, default=15, help='Number of anomalies to create')
     parser.add_argument('--logs', type=int, default=50, help='Number of audit logs to create')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Documents per insert_many batch for audit logs')
+    parser.add_argument('--rebuild-indexes', action='store_true',
+                        help='Drop secondary indexes before seeding and rebuild them afterwards (use with --clear)')
 
     args = parser.parse_args()
 
+    # Under Docker/CI stdout is a pipe (often with PYTHONUNBUFFERED set); buffer
+    # status lines and flush once in print_summary instead of per print
+    if not sys.stdout.isatty():
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
+
     print("\n" + "="*60)
     print("🌱 PROCURECHAIN DATABASE SEEDER")
     print("="*60 + "\n")
@@ -434,15 +571,34 @@ def main():
         seeder.clear_database()
 
     try:
-        seeder.create_users(args.users)
-        seeder.create_vendors(args.vendors)
-        seeder.create_procurements(args.procurements)
+        saved_indexes = {}
+        if args.rebuild_indexes:
+            saved_indexes = seeder.drop_secondary_indexes(['users', 'vendors', 'procurements'])
+
+        try:
+            # Users and vendors are independent; procurements need both
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                users_future = executor.submit(seeder.create_users, args.users)
+                vendors_future = executor.submit(seeder.create_vendors, args.vendors)
+                users_future.result()
+                vendors_future.result()
+
+            seeder.create_procurements(args.procurements)
+
+        finally:
+            # Restore indexes (including email_unique) even if seeding failed
+            if saved_indexes:
+                seeder.rebuild_indexes(saved_indexes)
+
+        # Audit logs reference the created anomalies, so they come last
         seeder.create_anomalies(args.anomalies)
-        seeder.create_audit_logs(args.logs)
+        seeder.create_audit_logs(args.logs, args.batch_size)
+
         seeder.print_summary()
 
     except Exception as e:
         print(f"\n❌ Error during seeding: {str(e)}")
+        sys.stdout.flush()
         import traceback
         traceback.print_exc()
         sys.exit(1)
@@ -2,7 +2,7 @@
 import sys
 import os
 from datetime import datetime, timedelta
-from bson import ObjectId
+from pymongo import UpdateOne
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -139,18 +139,29 @@ SAMPLE_USERS = [
 
 
 def seed_users():
-    """Seed sample users into the database"""
+    """Seed sample users into the database (requires setup_db.py to have run)"""
     print("🌱 Seeding users into database...\n")
 
     created_count = 0
     failed_count = 0
     skipped_count = 0
 
+    # The duplicate check below relies on setup_db's email_unique index
+    if 'email_unique' not in db.users.index_information():
+        print("✗ users.email_unique is missing. Run scripts/setup_db.py first.\n")
+        return
+
+    # Fetch all existing sample emails in one query instead of one find_one per user
+    emails = [u['email'].lower() for u in SAMPLE_USERS]
+    existing_emails = {d['email'] for d in db.users.find({'email': {'$in': emails}}, {'email': 1})}
+
+    new_users = []
+    user_records = []
+
     for user_data in SAMPLE_USERS:
         try:
             # Check if user already exists
-            existing_user = db.users.find_one({'email': user_data['email'].lower()})
-            if existing_user:
+            if user_data['email'].lower() in existing_emails:
                 print(f"⊗ Skipped: {user_data['full_name']} ({user_data['email']}) - already exists")
                 skipped_count += 1
                 continue
@@ -163,60 +174,58 @@ def seed_users():
             user_data['role'] = 'public'  # Default role for all users
 
             # Create user record using UserModel
-            user_record = UserModel.create_schema(user_data)
+            user_records.append(UserModel.create_schema(
+                user_data,
+                password_hash=UserModel.seed_password_hash(user_data['password'])
+            ))
+            new_users.append((user_data, profile_data))
+
+        except Exception as e:
+            print(f"✗ Error creating {user_data['full_name']}: {e}")
+            import traceback
+            traceback.print_exc()
+            failed_count += 1
+
+    if user_records:
+        # Insert all new users in one round-trip
+        result = db.users.insert_many(user_records, ordered=False)
 
-            # Insert user into database
-            result = db.users.insert_one(user_record)
-            user_id = str(result.inserted_id)
+        # Group profile docs by profile kind; educators get a learner profile
+        profile_docs = {'learner': [], 'employer': []}
+        profile_owners = {'learner': [], 'employer': []}
 
+        for (user_data, profile_data), user_id in zip(new_users, result.inserted_ids):
             print(f"✓ Created: {user_data['full_name']} ({user_data['user_type']}) - {user_data['email']}")
             created_count += 1
 
-            # Auto-create user profile based on user_type
-            profile_id = None
-            try:
-                if user_data['user_type'] == 'learner':
-                    profile_id = user_profile_service.create_learner_profile(user_id, {
-                        'full_name': user_data.get('full_name'),
-                        'email': user_data.get('email')
-                    })
-                elif user_data['user_type'] == 'employer':
-                    profile_id = user_profile_service.create_employer_profile(user_id, {
-                        'company_name': profile_data.get('company_name', user_data.get('full_name')),
-                        'email': user_data.get('email')
-                    })
-                elif user_data['user_type'] == 'educator':
-                    # Educators get learner profile
-                    profile_id = user_profile_service.create_learner_profile(user_id, {
-                        'full_name': user_data.get('full_name'),
-                        'email': user_data.get('email')
-                    })
-
-                # Update user record with profile_id
-                if profile_id:
-                    db.users.update_one(
-                        {'_id': ObjectId(user_id)},
-                        {'$set': {'profile_id': profile_id}}
-                    )
-
-                # Update profile with additional data
-                if profile_data:
-                    # Add user_type to profile if not present
-                    if 'user_type' not in profile_data:
-                        profile_data['user_type'] = user_data['user_type']
-
-                    user_profile_service.update_profile(user_id, profile_data)
-                    print(f"  → Profile updated with {len(profile_data)} fields")
-
-            except Exception as e:
-                print(f"  ⚠ Warning: Profile creation issue - {e}")
-                # Don't fail user creation if profile fails
+            if user_data['user_type'] == 'employer':
+                kind = 'employer'
+                doc = {'company_name': profile_data.get('company_name', user_data.get('full_name'))}
+            else:
+                kind = 'learner'
+                doc = {'full_name': user_data.get('full_name')}
+
+            doc.update({'user_id': user_id, 'email': user_data.get('email'), 'extra': profile_data})
+            profile_docs[kind].append(doc)
+            profile_owners[kind].append(user_id)
+
+        # One insert_many per profile kind, then one bulk_write to backfill profile_id
+        try:
+            profile_updates = []
+            for kind, docs in profile_docs.items():
+                profile_ids = user_profile_service.create_profiles_bulk(kind, docs)
+                profile_updates.extend(
+                    UpdateOne({'_id': user_id}, {'$set': {'profile_id': profile_id}})
+                    for user_id, profile_id in zip(profile_owners[kind], profile_ids)
+                )
+
+            if profile_updates:
+                db.users.bulk_write(profile_updates, ordered=False)
+                print(f"  → Created {len(profile_updates)} profiles")
 
         except Exception as e:
-            print(f"✗ Error creating {user_data['full_name']}: {e}")
-            import traceback
-            traceback.print_exc()
-            failed_count += 1
+            print(f"  ⚠ Warning: Profile creation issue - {e}")
+            # Don't fail user creation if profile fails
 
     print(f"\n{'='*60}")
     print(f"✓ Successfully created: {created_count} users")
@@ -248,4 +257,8 @@ def seed_users():
 
 
 if __name__ == '__main__':
+    # Buffer status lines when piped (Docker/CI); they are flushed once at exit
+    if not sys.stdout.isatty():
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
+
     seed_users()
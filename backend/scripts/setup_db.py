@@ -1,206 +1,540 @@
 """MongoDB database setup script - creates indexes and initial collections"""
 import sys
 import os
+import argparse
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
 from config.database import db, db_instance
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
-def create_indexes():
-    """Create all necessary indexes for the database"""
-    print("\n" + "="*60)
-    print("MongoDB Database Setup - Creating Indexes")
-    print("="*60 + "\n")
+# Partial indexes using $in and secondary indexes on time-series
+# collections both need MongoDB 6.0
+MIN_SERVER_VERSION = (6, 0)
 
+
+def check_server_version() -> bool:
+    """Refuse to build indexes on servers older than MIN_SERVER_VERSION"""
     try:
-        # Procurement Records Collection
-        print("Setting up procurement_records collection...")
-        db.procurement_records.create_index(
+        version = tuple(db_instance.client.server_info()['versionArray'][:2])
+    except Exception as e:
+        print(f"✗ Could not reach MongoDB: {str(e)}\n")
+        return False
+
+    if version < MIN_SERVER_VERSION:
+        required = '.'.join(map(str, MIN_SERVER_VERSION))
+        found = '.'.join(map(str, version))
+        print(f"✗ MongoDB {required}+ is required, server is {found}\n")
+        return False
+
+    return True
+
+
+def create_missing_indexes(collection, models: list, obsolete: tuple = ()) -> int:
+    """
+    Create only the indexes whose names are not already on the collection
+
+    Re-runs (e.g. at every container start) then cost one listIndexes
+    round trip instead of resending every index spec.
+
+    Args:
+        collection: PyMongo collection
+        models: IndexModel specs, each with an explicit name
+        obsolete: Names of superseded indexes to drop if still present
+
+    Returns:
+        Number of indexes created
+    """
+    existing = set(collection.index_information().keys())
+    missing = [m for m in models if m.document['name'] not in existing]
+
+    if missing:
+        collection.create_indexes(missing)
+
+    # Drop superseded indexes only once their replacements exist, so a failed
+    # build never leaves the collection without either
+    for name in obsolete:
+        if name in existing:
+            collection.drop_index(name)
+
+    return len(missing)
+
+
+def setup_procurement_records() -> str:
+    """Procurement Records Collection"""
+    create_missing_indexes(db.procurement_records, [
+        IndexModel(
             [('tender_number', ASCENDING)],
             unique=True,
             sparse=True,
-            name='tender_number_unique'
-        )
-        db.procurement_records.create_index(
-            [('status', ASCENDING)],
-            name='status_idx'
-        )
-        db.procurement_records.create_index(
-            [('published_date', DESCENDING)],
-            name='published_date_desc'
-        )
-        db.procurement_records.create_index(
-            [('category', ASCENDING)],
-            name='category_idx'
-        )
-        db.procurement_records.create_index(
+            name='tender_number_unique',
+            background=True
+        ),
+        IndexModel([('status', ASCENDING)], name='status_idx', background=True),
+        IndexModel([('published_date', DESCENDING)], name='published_date_desc', background=True),
+        # Listings filter on status and sort newest first (list_public_procurements)
+        IndexModel(
+            [('status', ASCENDING), ('published_date', DESCENDING)],
+            name='status_published_desc',
+            background=True
+        ),
+        IndexModel([('category', ASCENDING)], name='category_idx', background=True),
+        IndexModel(
             [('title', TEXT), ('description', TEXT)],
-            name='text_search'
-        )
-        db.procurement_records.create_index(
-            [('created_at', DESCENDING)],
-            name='created_at_desc'
-        )
-        print("✓ procurement_records indexes created\n")
-
-        # Vendors Collection
-        print("Setting up vendors collection...")
-        db.vendors.create_index(
+            name='text_search',
+            default_language='english',
+            language_override='none',
+            weights={'title': 10, 'description': 5},
+            background=True
+        ),
+        IndexModel([('created_at', DESCENDING)], name='created_at_desc', background=True)
+    ])
+    return "✓ procurement_records indexes created"
+
+
+def setup_procurements() -> str:
+    """Procurements Collection (used by the procurement and analytics services)"""
+    create_missing_indexes(db.procurements, [
+        # $match prefixes of the analytics pipelines and listings
+        IndexModel([('status', ASCENDING), ('created_at', DESCENDING)], name='status_created_desc', background=True),
+        IndexModel([('category', ASCENDING), ('estimated_value', DESCENDING)], name='category_value_desc', background=True),
+        IndexModel(
+            [('status', ASCENDING), ('published_date', ASCENDING), ('awarded_date', ASCENDING)],
+            name='status_published_awarded',
+            background=True
+        ),
+        IndexModel([('created_by', ASCENDING)], name='created_by_idx', background=True)
+    ])
+    return "✓ procurements indexes created"
+
+
+def setup_vendors() -> str:
+    """Vendors Collection"""
+    create_missing_indexes(db.vendors, [
+        IndexModel(
             [('registration_number', ASCENDING)],
             unique=True,
-            name='registration_number_unique'
-        )
-        db.vendors.create_index(
-            [('name', ASCENDING)],
-            name='name_idx'
-        )
-        db.vendors.create_index(
-            [('name', TEXT)],
-            name='name_text_search'
-        )
-        db.vendors.create_index(
-            [('performance_metrics.total_value', DESCENDING)],
-            name='total_value_desc'
-        )
-        print("✓ vendors indexes created\n")
-
-        # Anomaly Flags Collection
-        print("Setting up anomaly_flags collection...")
-        db.anomaly_flags.create_index(
-            [('procurement_id', ASCENDING)],
-            name='procurement_id_idx'
-        )
-        db.anomaly_flags.create_index(
+            name='registration_number_unique',
+            background=True
+        ),
+        IndexModel([('name', ASCENDING)], name='name_idx', background=True),
+        IndexModel([('name', TEXT)], name='name_text_search', background=True),
+        IndexModel([('performance_metrics.total_value', DESCENDING)], name='total_value_desc', background=True)
+    ])
+    return "✓ vendors indexes created"
+
+
+def setup_anomaly_flags() -> str:
+    """Anomaly Flags Collection"""
+    create_missing_indexes(db.anomaly_flags, [
+        IndexModel([('procurement_id', ASCENDING)], name='procurement_id_idx', background=True),
+        # Only unresolved flags are queried by status; resolved ones stay out
+        # of the index ($in in partialFilterExpression, see MIN_SERVER_VERSION)
+        IndexModel(
             [('status', ASCENDING)],
-            name='status_idx'
-        )
-        db.anomaly_flags.create_index(
-            [('risk_score', DESCENDING)],
-            name='risk_score_desc'
-        )
-        db.anomaly_flags.create_index(
-            [('flagged_at', DESCENDING)],
-            name='flagged_at_desc'
-        )
-        db.anomaly_flags.create_index(
-            [('severity', ASCENDING)],
-            name='severity_idx'
-        )
-        print("✓ anomaly_flags indexes created\n")
-
-        # Audit Logs Collection
-        print("Setting up audit_logs collection...")
-        db.audit_logs.create_index(
-            [('created_at', DESCENDING)],
-            name='created_at_desc'
+            name='status_open_partial',
+            partialFilterExpression={'status': {'$in': ['pending', 'investigating']}},
+            background=True
+        ),
+        IndexModel([('risk_score', DESCENDING)], name='risk_score_desc', background=True),
+        IndexModel([('flagged_at', DESCENDING)], name='flagged_at_desc', background=True),
+        IndexModel([('severity', ASCENDING)], name='severity_idx', background=True)
+    ], obsolete=('status_idx',))
+    return "✓ anomaly_flags indexes created"
+
+
+def setup_anomalies() -> str:
+    """Anomalies Collection (used by the anomaly and analytics services)"""
+    create_missing_indexes(db.anomalies, [
+        IndexModel([('status', ASCENDING), ('risk_score', DESCENDING)], name='status_risk_desc', background=True),
+        IndexModel([('severity', ASCENDING)], name='severity_idx', background=True),
+        IndexModel(
+            [('procurement_id', ASCENDING), ('flagged_at', DESCENDING)],
+            name='procurement_flagged_desc',
+            background=True
+        ),
+        # Only the high-risk pending anomalies counted by get_key_metrics;
+        # the predicate must match that query for the planner to use it
+        IndexModel(
+            [('risk_score', DESCENDING), ('status', ASCENDING)],
+            name='high_risk_pending_partial',
+            partialFilterExpression={'risk_score': {'$gte': 70}, 'status': 'pending'},
+            background=True
         )
-        db.audit_logs.create_index(
-            [('user_id', ASCENDING)],
-            name='user_id_idx'
+    ])
+    return "✓ anomalies indexes created"
+
+
+# Audit logs are kept for 2 years (63072000 seconds)
+AUDIT_LOG_RETENTION_SECONDS = 63072000
+
+
+def create_audit_logs_collection() -> bool:
+    """
+    Create audit_logs as a time-series collection if it does not exist yet
+
+    Audit records are append-only and read by time range, so bucketing
+    them by resource keeps storage small and expires old buckets without
+    a TTL index. Servers older than MongoDB 5.0 get a regular collection.
+
+    Returns:
+        True if audit_logs is a time-series collection
+    """
+    if 'audit_logs' not in db.list_collection_names():
+        try:
+            db.create_collection(
+                'audit_logs',
+                timeseries={'timeField': 'created_at', 'metaField': 'resource', 'granularity': 'seconds'},
+                expireAfterSeconds=AUDIT_LOG_RETENTION_SECONDS
+            )
+        except OperationFailure:
+            db.create_collection('audit_logs')
+
+    return 'timeseries' in db.audit_logs.options()
+
+
+def setup_audit_logs() -> str:
+    """Audit Logs Collection"""
+    timeseries = create_audit_logs_collection()
+
+    models = [
+        IndexModel([('created_at', DESCENDING)], name='created_at_desc', background=True),
+        # get_user_activity / get_resource_history: equality then newest first
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING)], name='user_created_desc', background=True),
+        IndexModel([('event_type', ASCENDING)], name='event_type_idx', background=True),
+        IndexModel(
+            [('resource.type', ASCENDING), ('resource.id', ASCENDING), ('created_at', DESCENDING)],
+            name='resource_created_desc',
+            background=True
         )
-        db.audit_logs.create_index(
-            [('event_type', ASCENDING)],
-            name='event_type_idx'
-        )
-        db.audit_logs.create_index(
-            [('resource.type', ASCENDING), ('resource.id', ASCENDING)],
-            name='resource_idx'
-        )
-
-        # TTL Index - Auto-delete logs older than 2 years (63072000 seconds)
-        db.audit_logs.create_index(
-            [('created_at', ASCENDING)],
-            expireAfterSeconds=63072000,
-            name='ttl_2years'
-        )
-        print("✓ audit_logs indexes created (with TTL)\n")
-
-        # Users Collection
-        print("Setting up users collection...")
-        db.users.create_index(
-            [('email', ASCENDING)],
+    ]
+
+    if timeseries:
+        # Secondary indexes on time-series collections need MongoDB 6.0 (MIN_SERVER_VERSION)
+        create_missing_indexes(db.audit_logs, models, obsolete=('user_id_idx', 'resource_idx'))
+        return "✓ audit_logs indexes created (time-series, 2 year retention)"
+
+    # TTL Index - Auto-delete logs older than 2 years
+    models.append(IndexModel(
+        [('created_at', ASCENDING)],
+        expireAfterSeconds=AUDIT_LOG_RETENTION_SECONDS,
+        name='ttl_2years',
+        background=True
+    ))
+    create_missing_indexes(db.audit_logs, models, obsolete=('user_id_idx', 'resource_idx'))
+    return "✓ audit_logs indexes created (with TTL)"
+
+
+def setup_bids() -> str:
+    """Bids Collection"""
+    create_missing_indexes(db.bids, [
+        # One bid per vendor per procurement; closes submit_bid's check-then-insert race
+        IndexModel(
+            [('procurement_id', ASCENDING), ('vendor_id', ASCENDING)],
             unique=True,
-            name='email_unique'
-        )
-        db.users.create_index(
-            [('role', ASCENDING)],
-            name='role_idx'
-        )
-        db.users.create_index(
+            name='procurement_vendor_unique',
+            background=True
+        ),
+        # get_procurement_bids: equality, sort, then the status $ne range
+        IndexModel(
+            [('procurement_id', ASCENDING), ('submitted_at', ASCENDING), ('status', ASCENDING)],
+            name='procurement_submitted_status',
+            background=True
+        ),
+        # calculate_final_scores: rank a procurement's bids by stored total_score
+        IndexModel(
+            [('procurement_id', ASCENDING), ('total_score', DESCENDING)],
+            name='procurement_total_score_desc',
+            background=True
+        ),
+        # get_vendor_bids: newest first
+        IndexModel([('vendor_id', ASCENDING), ('submitted_at', DESCENDING)], name='vendor_submitted_desc', background=True)
+    ])
+    return "✓ bids indexes created"
+
+
+def setup_audit_rollup_daily() -> str:
+    """Daily Audit Rollup Collection (per-user event counts)"""
+    create_missing_indexes(db.audit_rollup_daily, [
+        # get_user_activity_summary: one user, most recent days first
+        IndexModel([('_id.user_id', ASCENDING), ('_id.day', DESCENDING)], name='user_day_desc', background=True)
+    ])
+    return "✓ audit_rollup_daily indexes created"
+
+
+def setup_users() -> str:
+    """Users Collection"""
+    create_missing_indexes(db.users, [
+        IndexModel([('email', ASCENDING)], unique=True, name='email_unique', background=True),
+        IndexModel([('role', ASCENDING)], name='role_idx', background=True),
+        IndexModel(
             [('status', ASCENDING)],
-            name='status_idx'
+            name='status_active_partial',
+            partialFilterExpression={'status': 'active'},
+            background=True
         )
-        print("✓ users indexes created\n")
+    ], obsolete=('status_idx',))
+    return "✓ users indexes created"
+
 
-        # Sessions Collection (for future session management)
-        print("Setting up sessions collection...")
-        db.sessions.create_index(
+def setup_sessions() -> str:
+    """Sessions Collection (for future session management)"""
+    create_missing_indexes(db.sessions, [
+        IndexModel(
             [('session_id', ASCENDING)],
             unique=True,
             sparse=True,
-            name='session_id_unique'
-        )
-        db.sessions.create_index(
-            [('user_id', ASCENDING)],
-            name='user_id_idx'
-        )
-
+            name='session_id_unique',
+            background=True
+        ),
+        IndexModel([('user_id', ASCENDING)], name='user_id_idx', background=True),
         # TTL Index - Auto-delete expired sessions
-        db.sessions.create_index(
-            [('expires_at', ASCENDING)],
-            expireAfterSeconds=0,
-            name='ttl_sessions'
-        )
-        print("✓ sessions indexes created (with TTL)\n")
+        IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0, name='ttl_sessions', background=True)
+    ])
+    return "✓ sessions indexes created (with TTL)"
 
-        # Analytics Cache Collection
-        print("Setting up analytics_cache collection...")
-        db.analytics_cache.create_index(
-            [('cache_key', ASCENDING)],
-            unique=True,
-            name='cache_key_unique'
-        )
 
+def setup_analytics_cache() -> str:
+    """Analytics Cache Collection"""
+    create_missing_indexes(db.analytics_cache, [
+        IndexModel([('cache_key', ASCENDING)], unique=True, name='cache_key_unique', background=True),
         # TTL Index - Auto-delete expired cache
-        db.analytics_cache.create_index(
-            [('expires_at', ASCENDING)],
-            expireAfterSeconds=0,
-            name='ttl_cache'
-        )
-        print("✓ analytics_cache indexes created (with TTL)\n")
+        IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0, name='ttl_cache', background=True)
+    ])
+    return "✓ analytics_cache indexes created (with TTL)"
+
+
+def setup_rate_limits() -> str:
+    """Rate Limits Collection (for rate limiting)"""
+    create_missing_indexes(db.rate_limits, [
+        # Sliding-window lookups: identifier equality, newest timestamps first
+        IndexModel(
+            [('identifier', ASCENDING), ('timestamp', DESCENDING)],
+            name='identifier_timestamp_desc',
+            background=True
+        ),
+        # TTL Index - Auto-delete old rate limit entries after 1 hour
+        IndexModel([('timestamp', ASCENDING)], expireAfterSeconds=3600, name='ttl_rate_limits', background=True)
+    ], obsolete=('identifier_timestamp_idx',))
+    return "✓ rate_limits indexes created (with TTL)"
 
-        # Rate Limits Collection (for rate limiting)
-        print("Setting up rate_limits collection...")
-        db.rate_limits.create_index(
-            [('identifier', ASCENDING), ('timestamp', ASCENDING)],
-            name='identifier_timestamp_idx'
-        )
 
-        # TTL Index - Auto-delete old rate limit entries after 1 hour
-        db.rate_limits.create_index(
-            [('timestamp', ASCENDING)],
-            expireAfterSeconds=3600,
-            name='ttl_rate_limits'
+def find_duplicate_challenge_titles() -> list:
+    """
+    Group challenges sharing a title, most used then oldest first
+
+    Returns:
+        [{'_id': title, 'ids': [challenge _ids]}] for each duplicated title
+    """
+    return list(db.challenges.aggregate([
+        {'$sort': {'metadata.times_used': -1, 'created_at': 1}},
+        {'$group': {'_id': '$title', 'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}}
+    ], allowDiskUse=True))
+
+
+def dedupe_challenge_titles() -> bool:
+    """Keep one challenge per title so title_unique can be built"""
+    print("\n" + "="*60)
+    print("Removing Duplicate Challenge Titles")
+    print("="*60 + "\n")
+
+    try:
+        duplicates = find_duplicate_challenge_titles()
+        removed = 0
+
+        for group in duplicates:
+            keeper, extras = group['ids'][0], group['ids'][1:]
+
+            # Assessments may store the challenge reference as either type
+            db.skill_assessments.update_many(
+                {'challenge_id': {'$in': extras}},
+                {'$set': {'challenge_id': keeper}}
+            )
+            db.skill_assessments.update_many(
+                {'challenge_id': {'$in': [str(extra) for extra in extras]}},
+                {'$set': {'challenge_id': str(keeper)}}
+            )
+
+            removed += db.challenges.delete_many({'_id': {'$in': extras}}).deleted_count
+
+        print(f"✓ Removed {removed} duplicate challenges across {len(duplicates)} titles\n")
+        return True
+
+    except Exception as e:
+        print(f"✗ Error removing duplicate challenges: {e}")
+        return False
+
+
+def setup_challenges() -> str:
+    """Challenges Collection"""
+    # Earlier seeders inserted the same titles on every run
+    if 'title_unique' not in db.challenges.index_information():
+        duplicates = find_duplicate_challenge_titles()
+        if duplicates:
+            raise RuntimeError(
+                f"{len(duplicates)} challenge titles are duplicated, so title_unique cannot be built. "
+                "Run setup_db.py --dedupe-challenges to keep one challenge per title."
+            )
+
+    create_missing_indexes(db.challenges, [
+        IndexModel([('title', ASCENDING)], unique=True, name='title_unique', background=True),
+        # get_challenges with skill/difficulty filters
+        IndexModel(
+            [
+                ('skill', ASCENDING),
+                ('difficulty_level', ASCENDING),
+                ('is_active', ASCENDING),
+                ('is_public', ASCENDING),
+                ('created_at', DESCENDING)
+            ],
+            name='skill_difficulty_active_created',
+            background=True
+        ),
+        # get_random_challenge seeks on rand
+        IndexModel(
+            [
+                ('skill', ASCENDING),
+                ('difficulty_level', ASCENDING),
+                ('is_active', ASCENDING),
+                ('is_public', ASCENDING),
+                ('rand', ASCENDING)
+            ],
+            name='skill_difficulty_active_rand',
+            background=True
+        ),
+        # get_challenges without skill filter
+        IndexModel(
+            [('is_active', ASCENDING), ('is_public', ASCENDING), ('created_at', DESCENDING)],
+            name='active_public_created',
+            background=True
+        ),
+        # Most popular challenges
+        IndexModel([('is_active', ASCENDING), ('metadata.times_used', DESCENDING)], name='active_times_used', background=True),
+        # search_challenges
+        IndexModel(
+            [('title', TEXT), ('description', TEXT), ('skill', TEXT)],
+            name='text_search',
+            default_language='english',
+            language_override='none',
+            weights={'title': 10, 'skill': 5, 'description': 1},
+            background=True
+        )
+    ])
+    return "✓ challenges indexes created"
+
+
+def setup_documents() -> str:
+    """GridFS Document Files (metadata lookups)"""
+    create_missing_indexes(db['documents.files'], [
+        # list_documents / get_document_by_procurement, newest first
+        IndexModel(
+            [('metadata.procurement_id', ASCENDING), ('uploadDate', DESCENDING)],
+            name='procurement_upload_date_desc',
+            background=True
         )
-        print("✓ rate_limits indexes created (with TTL)\n")
+    ])
+    return "✓ documents.files indexes created"
+
+
+# Each collection's indexes are independent, so they are built concurrently
+COLLECTION_SETUPS = [
+    setup_procurement_records,
+    setup_procurements,
+    setup_vendors,
+    setup_anomaly_flags,
+    setup_anomalies,
+    setup_bids,
+    setup_audit_logs,
+    setup_audit_rollup_daily,
+    setup_users,
+    setup_sessions,
+    setup_analytics_cache,
+    setup_rate_limits,
+    setup_challenges,
+    setup_documents
+]
+
+INDEX_SETUP_WORKERS = 8
+
+# Collections whose secondary indexes --rebuild / --drop-only manage
+INDEXED_COLLECTIONS = [
+    'procurement_records',
+    'procurements',
+    'vendors',
+    'anomaly_flags',
+    'anomalies',
+    'bids',
+    'audit_logs',
+    'audit_rollup_daily',
+    'users',
+    'sessions',
+    'analytics_cache',
+    'rate_limits',
+    'challenges'
+]
+
+
+def drop_indexes():
+    """Drop all non-_id indexes so bulk imports skip index maintenance"""
+    print("\n" + "="*60)
+    print("Dropping Secondary Indexes")
+    print("="*60 + "\n")
 
-        # GridFS indexes are created automatically by MongoDB
-        print("✓ GridFS collections (documents.files, documents.chunks) have automatic indexes\n")
+    try:
+        for collection_name in INDEXED_COLLECTIONS:
+            db[collection_name].drop_indexes()
+            print(f"✓ {collection_name} indexes dropped")
 
-        print("="*60)
-        print("✓ All indexes created successfully!")
-        print("="*60 + "\n")
+        print()
+        return True
+
+    except Exception as e:
+        print(f"✗ Error dropping indexes: {e}")
+        return False
+
+
+def create_indexes():
+    """Create all necessary indexes for the database"""
+    # Status lines are collected and written once at the end
+    log = [
+        "\n" + "="*60,
+        "MongoDB Database Setup - Creating Indexes",
+        "="*60 + "\n"
+    ]
+
+    try:
+        # PyMongo's client is thread-safe and pooled, so the builds overlap
+        with ThreadPoolExecutor(max_workers=INDEX_SETUP_WORKERS) as executor:
+            futures = [executor.submit(setup) for setup in COLLECTION_SETUPS]
+
+            for future in as_completed(futures):
+                log.append(future.result())
+
+        # GridFS creates its own filename and chunk indexes on first write
+        log.append("\n✓ GridFS collections (documents.files, documents.chunks) have automatic indexes\n")
+
+        log.extend([
+            "="*60,
+            "✓ All indexes created successfully!",
+            "="*60 + "\n"
+        ])
 
         return True
 
     except Exception as e:
-        print(f"✗ Error creating indexes: {e}")
+        log.append(f"✗ Error creating indexes: {e}")
         return False
 
+    finally:
+        sys.stdout.write("\n".join(log) + "\n")
+        sys.stdout.flush()
+
 
 def create_initial_admin():
     """Create initial admin user if none exists"""
@@ -209,8 +543,8 @@ def create_initial_admin():
     print("="*60 + "\n")
 
     try:
-        # Check if any admin exists
-        admin_exists = db.users.find_one({'role': 'admin'})
+        # Check if any admin exists (stops at the first match on role_idx)
+        admin_exists = db.users.count_documents({'role': 'admin'}, limit=1) > 0
 
         if admin_exists:
             print("✓ Admin user already exists. Skipping...\n")
@@ -229,7 +563,18 @@ def create_initial_admin():
         }
 
         admin_record = UserModel.create_schema(admin_data)
-        result = db.users.insert_one(admin_record)
+
+        # Single race-safe write on email_unique: a concurrent setup run that
+        # got here first leaves its record untouched
+        result = db.users.update_one(
+            {'email': admin_record['email']},
+            {'$setOnInsert': admin_record},
+            upsert=True
+        )
+
+        if result.upserted_id is None:
+            print("✓ Admin user already exists. Skipping...\n")
+            return True
 
         print("✓ Initial admin user created successfully!")
         print(f"   Email: {admin_data['email']}")
@@ -243,6 +588,53 @@ def create_initial_admin():
         return False
 
 
+def prewarm_ai_cache(n: int = 50) -> bool:
+    """
+    Generate AI explanations for the newest published procurements
+
+    Fills the analytics_cache so the first public views are served from
+    cache instead of waiting on Gemini.
+
+    Args:
+        n: Number of procurements to explain
+
+    Returns:
+        True if prewarm ran (or AI is unavailable), False on error
+    """
+    print("\n" + "="*60)
+    print("Pre-warming AI Explanation Cache")
+    print("="*60 + "\n")
+
+    from services.ai_service import ai_service
+    from utils.db_helpers import serialize_document
+
+    if not ai_service.is_available():
+        print("⚠️  AI service not available. Skipping...\n")
+        return True
+
+    try:
+        recent = db.procurement_records.find(
+            {'status': 'published'}
+        ).sort('published_date', DESCENDING).limit(n)
+        procurements = [serialize_document(doc) for doc in recent]
+
+        results = ai_service.explain_procurements_bulk(procurements)
+
+        failed = sum(1 for result in results if 'error' in result)
+        stats = ai_service.cache_stats
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = (stats['hits'] / lookups * 100) if lookups else 0
+
+        print(f"✓ Explained {len(results) - failed}/{len(results)} procurements")
+        print(f"   Cache hits: {stats['hits']}, misses: {stats['misses']} ({hit_rate:.0f}% hit rate)\n")
+
+        return True
+
+    except Exception as e:
+        print(f"✗ Error pre-warming AI cache: {e}\n")
+        return False
+
+
 def verify_setup():
     """Verify database setup"""
     print("\n" + "="*60)
@@ -258,8 +650,10 @@ def verify_setup():
         # Check indexes for key collections
         key_collections = [
             'procurement_records',
+            'procurements',
             'vendors',
             'anomaly_flags',
+            'anomalies',
             'audit_logs',
             'users'
         ]
@@ -282,8 +676,16 @@ def verify_setup():
         return False
 
 
-def main():
-    """Main setup function"""
+def main(prewarm_ai: int = 0, rebuild: bool = False, drop_only: bool = False, dedupe_challenges: bool = False):
+    """
+    Main setup function
+
+    Args:
+        prewarm_ai: Number of recent procurements to pre-explain with AI (0 to skip)
+        rebuild: Drop secondary indexes before creating them
+        drop_only: Drop secondary indexes and stop (run before a bulk import)
+        dedupe_challenges: Remove duplicate challenge titles before indexing
+    """
     print("\n" + "="*60)
     print("ProcureChain MongoDB Database Setup")
     print("="*60)
@@ -291,12 +693,19 @@ def main():
     print(f"Connection: {db_instance.client.address}")
     print("="*60 + "\n")
 
-    # Test connection
-    if not db_instance.ping():
-        print("✗ Failed to connect to MongoDB. Please check your connection settings.\n")
+    # Drop indexes first when rebuilding or preparing for a bulk import
+    if (rebuild or drop_only) and not drop_indexes():
         return False
 
-    print("✓ MongoDB connection successful!\n")
+    if drop_only:
+        print("✓ Indexes dropped. Import data, then run setup_db.py to rebuild them.\n")
+        return True
+
+    if not check_server_version():
+        return False
+
+    if dedupe_challenges and not dedupe_challenge_titles():
+        return False
 
     # Create indexes
     if not create_indexes():
@@ -306,6 +715,10 @@ def main():
     if not create_initial_admin():
         print("⚠️  Warning: Failed to create initial admin user\n")
 
+    # Pre-warm AI cache (opt-in; each miss is a Gemini call)
+    if prewarm_ai and not prewarm_ai_cache(prewarm_ai):
+        print("⚠️  Warning: Failed to pre-warm AI cache\n")
+
     # Verify setup
     if not verify_setup():
         return False
@@ -318,8 +731,28 @@ def main():
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Create ProcureChain MongoDB indexes and initial data',
+        epilog='Bulk loads: run with --drop-only, import the data, then run again '
+               'without flags so every index is built once over the loaded data.'
+    )
+    parser.add_argument('--prewarm-ai', type=int, default=0, metavar='N',
+                        help='Pre-generate AI explanations for the N newest published procurements')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='Drop all secondary indexes and recreate them (also applies changed index options)')
+    parser.add_argument('--drop-only', action='store_true',
+                        help='Drop all secondary indexes and exit, before a bulk import')
+    parser.add_argument('--dedupe-challenges', action='store_true',
+                        help='Keep one challenge per title (the most used) so the unique title index can be built')
+    args = parser.parse_args()
+
     try:
-        success = main()
+        success = main(
+            prewarm_ai=args.prewarm_ai,
+            rebuild=args.rebuild,
+            drop_only=args.drop_only,
+            dedupe_challenges=args.dedupe_challenges
+        )
         sys.exit(0 if success else 1)
     except KeyboardInterrupt:
         print("\n\n✗ Setup interrupted by user\n")
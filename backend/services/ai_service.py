@@ -1,58 +1,60 @@
 """AI Service using Google Gemini for intelligent features"""
+import logging
 import os
-import google.generativeai as genai
-from typing import Dict, List, Optional, Any
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Any, TypedDict
+from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError
+import hashlib
 import json
+import re
+import time
+from config.database import db
+from config.settings import get_config
+from utils.gemini import get_model
 
+logger = logging.getLogger(__name__)
 
-class AIService:
-    """Service for AI-powered features using Google Gemini"""
+# Outermost JSON object in a Gemini reply, ignoring ```json fences or prose around it
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
 
-    def __init__(self):
-        """Initialize Gemini AI"""
-        api_key = os.getenv('GEMINI_API_KEY')
-        if not api_key:
-            print("WARNING: GEMINI_API_KEY not found in environment variables")
-            self.model = None
-            return
+# Longest description sent to Gemini; input tokens dominate latency and cost
+MAX_DESCRIPTION_CHARS = 2000
 
-        genai.configure(api_key=api_key)
-        # Use gemini-2.5-flash - latest stable, fast and won't run out
-        # High limits: 15 RPM (free tier), excellent quality
-        self.model = genai.GenerativeModel('models/gemini-2.5-flash')
 
-    def is_available(self) -> bool:
-        """Check if AI service is available"""
-        return self.model is not None
+def _clip(text: Optional[str], limit: int = MAX_DESCRIPTION_CHARS) -> Optional[str]:
+    """Truncate text to limit characters, marking the cut with an ellipsis"""
+    if not text or len(text) <= limit:
+        return text
 
-    def explain_procurement(self, procurement: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Explain a procurement in simple terms for public understanding
+    logger.debug("AI prompt: description truncated from %d to %d chars", len(text), limit)
+    return text[:limit] + '…'
 
-        Args:
-            procurement: Procurement document
 
-        Returns:
-            Dict with explanation, key_points, and potential_concerns
-        """
-        if not self.is_available():
-            return {
-                "error": "AI service not available",
-                "explanation": "AI explanations are currently unavailable. Please check the procurement details manually."
-            }
+# Concurrent Gemini calls for bulk requests, shared across all of them
+BULK_MAX_WORKERS = 10
+BULK_EXECUTOR = ThreadPoolExecutor(max_workers=BULK_MAX_WORKERS, thread_name_prefix='ai-bulk')
 
-        try:
-            prompt = f"""
+
+# Prompt templates, built once at import and filled with str.format_map
+_VENDOR_FIELDS = (
+    'name', 'registration_number', 'tax_id', 'address',
+    'business_type', 'industry', 'contact_email', 'contact_phone'
+)
+
+_EXPLAIN_TEMPLATE = """
 You are a public procurement transparency assistant helping citizens understand government procurements.
 
 Analyze this procurement and provide a clear, accessible explanation:
 
-Title: {procurement.get('title')}
-Category: {procurement.get('category')}
-Department: {procurement.get('department', 'Not specified')}
-Estimated Value: {procurement.get('currency', 'USD')} {procurement.get('estimated_value', 0):,.2f}
-Status: {procurement.get('status')}
-Description: {procurement.get('description', 'No description provided')}
+Title: {title}
+Category: {category}
+Department: {department}
+Estimated Value: {currency} {estimated_value:,.2f}
+Status: {status}
+Description: {description}
 
 Provide your analysis in this JSON format:
 {{
@@ -72,72 +74,22 @@ Provide your analysis in this JSON format:
 Return ONLY valid JSON, no additional text.
 """
 
-            response = self.model.generate_content(prompt)
-            # Clean the response text - remove markdown code blocks if present
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]  # Remove ```json
-            if response_text.startswith('```'):
-                response_text = response_text[3:]  # Remove ```
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]  # Remove trailing ```
-            response_text = response_text.strip()
-
-            result = json.loads(response_text)
-            return result
-
-        except json.JSONDecodeError as e:
-            # Fallback if JSON parsing fails
-            print(f"JSON parse error: {e}")
-            print(f"Response text: {response.text[:200]}")
-            return {
-                "simple_explanation": response.text[:500],
-                "key_points": ["AI analysis available but format error occurred"],
-                "error": "JSON parsing error"
-            }
-        except Exception as e:
-            print(f"Error in explain_procurement: {e}")
-            return {
-                "error": str(e),
-                "explanation": "Unable to generate AI explanation at this time."
-            }
-
-    def analyze_anomaly(self, anomaly: Dict[str, Any], procurement: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """
-        Explain an anomaly in understandable terms
-
-        Args:
-            anomaly: Anomaly document
-            procurement: Related procurement (optional)
-
-        Returns:
-            Dict with explanation and recommendations
-        """
-        if not self.is_available():
-            return {
-                "error": "AI service not available",
-                "explanation": "AI analysis is currently unavailable."
-            }
-
-        try:
-            procurement_context = ""
-            if procurement:
-                procurement_context = f"""
+_ANOMALY_PROCUREMENT_CONTEXT = """
 Related Procurement:
-- Title: {procurement.get('title')}
-- Value: {procurement.get('currency', 'USD')} {procurement.get('estimated_value', 0):,.2f}
-- Department: {procurement.get('department', 'Not specified')}
+- Title: {title}
+- Value: {currency} {estimated_value:,.2f}
+- Department: {department}
 """
 
-            prompt = f"""
+_ANOMALY_TEMPLATE = """
 You are a procurement fraud detection expert explaining anomalies to government auditors and the public.
 
 Analyze this anomaly:
 
-Type: {anomaly.get('anomaly_type')}
-Severity: {anomaly.get('severity')}
-Status: {anomaly.get('status')}
-Description: {anomaly.get('description', 'No description')}
+Type: {anomaly_type}
+Severity: {severity}
+Status: {status}
+Description: {description}
 {procurement_context}
 
 Provide your analysis in this JSON format:
@@ -157,52 +109,19 @@ Provide your analysis in this JSON format:
 Return ONLY valid JSON, no additional text.
 """
 
-            response = self.model.generate_content(prompt)
-            result = json.loads(response.text)
-            return result
-
-        except json.JSONDecodeError:
-            return {
-                "what_happened": response.text[:500],
-                "error": "JSON parsing error"
-            }
-        except Exception as e:
-            print(f"Error in analyze_anomaly: {e}")
-            return {
-                "error": str(e),
-                "explanation": "Unable to generate AI analysis at this time."
-            }
-
-    def verify_vendor(self, vendor_data: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Analyze vendor information for potential issues
-
-        Args:
-            vendor_data: Vendor information to verify
-
-        Returns:
-            Dict with verification results and risk assessment
-        """
-        if not self.is_available():
-            return {
-                "error": "AI service not available",
-                "verification_status": "manual_review_required"
-            }
-
-        try:
-            prompt = f"""
+_VENDOR_TEMPLATE = """
 You are a vendor verification specialist analyzing business registration information.
 
 Analyze this vendor:
 
-Name: {vendor_data.get('name', 'Not provided')}
-Registration Number: {vendor_data.get('registration_number', 'Not provided')}
-Tax ID: {vendor_data.get('tax_id', 'Not provided')}
-Address: {vendor_data.get('address', 'Not provided')}
-Business Type: {vendor_data.get('business_type', 'Not provided')}
-Industry: {vendor_data.get('industry', 'Not provided')}
-Contact Email: {vendor_data.get('contact_email', 'Not provided')}
-Contact Phone: {vendor_data.get('contact_phone', 'Not provided')}
+Name: {name}
+Registration Number: {registration_number}
+Tax ID: {tax_id}
+Address: {address}
+Business Type: {business_type}
+Industry: {industry}
+Contact Email: {contact_email}
+Contact Phone: {contact_phone}
 
 Based on the information provided, perform a verification analysis and return ONLY valid JSON:
 {{
@@ -231,53 +150,18 @@ Based on the information provided, perform a verification analysis and return ON
 Return ONLY valid JSON, no additional text.
 """
 
-            response = self.model.generate_content(prompt)
-            result = json.loads(response.text)
-            return result
-
-        except json.JSONDecodeError:
-            return {
-                "risk_level": "medium",
-                "overall_assessment": response.text[:500],
-                "error": "JSON parsing error"
-            }
-        except Exception as e:
-            print(f"Error in verify_vendor: {e}")
-            return {
-                "error": str(e),
-                "verification_status": "error",
-                "risk_level": "unknown"
-            }
-
-    def suggest_improvements(self, procurement: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Suggest improvements to make procurement more transparent and competitive
-
-        Args:
-            procurement: Procurement document
-
-        Returns:
-            Dict with suggestions for improvement
-        """
-        if not self.is_available():
-            return {
-                "error": "AI service not available",
-                "suggestions": []
-            }
-
-        try:
-            prompt = f"""
+_IMPROVEMENTS_TEMPLATE = """
 You are a procurement best practices expert reviewing a tender for improvements.
 
 Review this procurement:
 
-Title: {procurement.get('title')}
-Description: {procurement.get('description', 'No description')}
-Category: {procurement.get('category')}
-Estimated Value: {procurement.get('currency', 'USD')} {procurement.get('estimated_value', 0):,.2f}
-Documents Required: {len(procurement.get('required_documents', []))} documents
-Evaluation Criteria: {len(procurement.get('evaluation_criteria', []))} criteria defined
-Eligibility Criteria: {len(procurement.get('eligibility_criteria', []))} criteria defined
+Title: {title}
+Description: {description}
+Category: {category}
+Estimated Value: {currency} {estimated_value:,.2f}
+Documents Required: {required_documents} documents
+Evaluation Criteria: {evaluation_criteria} criteria defined
+Eligibility Criteria: {eligibility_criteria} criteria defined
 
 Provide improvement suggestions in this JSON format:
 {{
@@ -305,22 +189,454 @@ Provide improvement suggestions in this JSON format:
 Return ONLY valid JSON, no additional text.
 """
 
-            response = self.model.generate_content(prompt)
-            result = json.loads(response.text)
-            return result
 
+# Response schemas - Gemini returns JSON matching these directly
+class ExplainSchema(TypedDict):
+    simple_explanation: str
+    key_points: List[str]
+    what_is_being_bought: str
+    why_it_matters: str
+    potential_red_flags: List[str]
+    transparency_score: int
+    transparency_explanation: str
+
+
+class AnomalySchema(TypedDict):
+    what_happened: str
+    why_it_matters: str
+    severity_explanation: str
+    recommended_actions: List[str]
+    similar_cases: str
+    red_flags: List[str]
+
+
+class VerificationItem(TypedDict):
+    item: str
+    status: str
+    notes: str
+
+
+class VendorSchema(TypedDict):
+    risk_level: str
+    risk_score: int
+    verification_items: List[VerificationItem]
+    red_flags: List[str]
+    recommendations: List[str]
+    data_completeness: int
+    missing_information: List[str]
+    overall_assessment: str
+
+
+class Improvement(TypedDict):
+    category: str
+    priority: str
+    suggestion: str
+    rationale: str
+
+
+class ImprovementsSchema(TypedDict):
+    strengths: List[str]
+    improvements: List[Improvement]
+    missing_elements: List[str]
+    best_practices: List[str]
+    competition_score: int
+    competition_explanation: str
+
+
+class AIService:
+    """Service for AI-powered features using Google Gemini"""
+
+    # Gemini responses are cached in analytics_cache (TTL index on expires_at)
+    CACHE_TTL = timedelta(seconds=get_config().CACHE_TTL_GEMINI)
+
+    # Bulk and prewarm Gemini calls allowed per rolling minute in this
+    # process (free tier: 15 RPM); interactive calls are not throttled
+    REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '15'))
+
+    # Throttled calls retry on rate limits (ResourceExhausted) with exponential backoff
+    MAX_ATTEMPTS = 3
+    RETRY_BASE_DELAY = 0.5
+    RETRY_MAX_DELAY = 4
+
+    def __init__(self):
+        """Initialize Gemini AI"""
+        self.cache = db.analytics_cache
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+        # Start times of Gemini calls in the last minute, for _throttle
+        self._call_times = deque()
+        self._rate_lock = threading.Lock()
+
+        self.api_key = os.getenv('GEMINI_API_KEY')
+
+        if not self.api_key:
+            print("WARNING: GEMINI_API_KEY not found in environment variables")
+
+    @property
+    def model(self):
+        """Gemini model, configured on first access (None without an API key)"""
+        if not self.api_key:
+            return None
+
+        # Use gemini-2.5-flash - latest stable, fast and won't run out
+        # High limits: 15 RPM (free tier), excellent quality
+        return get_model('models/gemini-2.5-flash')
+
+    def is_available(self) -> bool:
+        """Check if AI service is available"""
+        return bool(self.api_key)
+
+    @staticmethod
+    def _generation_config(schema: type) -> Dict[str, Any]:
+        """Generation config asking Gemini for JSON output matching schema"""
+        return {
+            'response_mime_type': 'application/json',
+            'response_schema': schema
+        }
+
+    @staticmethod
+    def _parse_json(text: str) -> Dict[str, Any]:
+        """
+        Parse the JSON object out of a model response
+
+        Structured output is plain JSON; the regex is only a fallback for
+        replies that still arrive wrapped in prose or markdown fences.
+
+        Raises:
+            json.JSONDecodeError: If no valid JSON object is found
+        """
+        try:
+            return json.loads(text)
         except json.JSONDecodeError:
+            match = _JSON_RE.search(text)
+            if not match:
+                raise
+            return json.loads(match.group(0))
+
+    @staticmethod
+    def _cache_key(method: str, prompt: str) -> str:
+        """Cache key from the method name and the SHA-256 of its prompt"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        return f"ai:{method}:{digest}"
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached AI response
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached response or None on miss
+        """
+        try:
+            cached = self.cache.find_one(
+                {'cache_key': key, 'expires_at': {'$gt': datetime.utcnow()}},
+                {'value': 1}
+            )
+        except PyMongoError as e:
+            print(f"AI cache read failed: {e}")
+            return None
+
+        with self._stats_lock:
+            self.cache_stats['hits' if cached else 'misses'] += 1
+        return cached['value'] if cached else None
+
+    def _cache_set(self, key: str, value: Dict[str, Any], ttl: timedelta = None) -> None:
+        """
+        Store an AI response in the cache
+
+        Args:
+            key: Cache key
+            value: Parsed Gemini response
+            ttl: Time to live (defaults to CACHE_TTL)
+        """
+        now = datetime.utcnow()
+
+        try:
+            self.cache.update_one(
+                {'cache_key': key},
+                {'$set': {
+                    'value': value,
+                    'created_at': now,
+                    'expires_at': now + (ttl or self.CACHE_TTL)
+                }},
+                upsert=True
+            )
+        except PyMongoError as e:
+            print(f"AI cache write failed: {e}")
+
+    def _throttle(self) -> None:
+        """Block until a Gemini call fits under REQUESTS_PER_MINUTE"""
+        while True:
+            with self._rate_lock:
+                now = time.monotonic()
+                while self._call_times and now - self._call_times[0] >= 60:
+                    self._call_times.popleft()
+
+                if len(self._call_times) < self.REQUESTS_PER_MINUTE:
+                    self._call_times.append(now)
+                    return
+
+                wait = 60 - (now - self._call_times[0])
+
+            time.sleep(wait)
+
+    def _generate(self, prompt: str, schema: type, throttle: bool = False):
+        """
+        Call Gemini
+
+        Interactive calls make one attempt so a rate limit fails fast into
+        the caller's fallback. Throttled (bulk and prewarm) calls wait for
+        a REQUESTS_PER_MINUTE slot and back off exponentially on rate limits.
+
+        Args:
+            prompt: Rendered prompt
+            schema: Response schema for structured output
+            throttle: Pace and retry for background batch work
+
+        Raises:
+            google.api_core.exceptions.ResourceExhausted: If rate limited
+                (after MAX_ATTEMPTS when throttled)
+        """
+        from google.api_core.exceptions import ResourceExhausted
+
+        attempts = self.MAX_ATTEMPTS if throttle else 1
+
+        for attempt in range(attempts):
+            if throttle:
+                self._throttle()
+            try:
+                return self.model.generate_content(
+                    prompt,
+                    generation_config=self._generation_config(schema)
+                )
+            except ResourceExhausted:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(min(self.RETRY_BASE_DELAY * 2 ** attempt, self.RETRY_MAX_DELAY))
+
+    def _call(
+        self,
+        method: str,
+        render_prompt: Callable[[], str],
+        schema: type,
+        on_parse_error: Callable[[str], Dict[str, Any]],
+        on_error: Callable[[Exception], Dict[str, Any]],
+        throttle: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Run a prompt through the cache, Gemini and the JSON parser
+
+        Args:
+            method: Public method name (cache namespace and log prefix)
+            render_prompt: Builds the prompt (formatting errors go to on_error)
+            schema: Response schema for structured output
+            on_parse_error: Builds the fallback result from unparseable response text
+            on_error: Builds the fallback result from any other exception
+            throttle: Pace the Gemini call (bulk and prewarm only)
+
+        Returns:
+            Parsed response, or the fallback result
+        """
+        try:
+            prompt = render_prompt()
+            cache_key = self._cache_key(method, prompt)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+
+            response = self._generate(prompt, schema, throttle)
+        except Exception as e:
+            print(f"Error in {method}: {e}")
+            return on_error(e)
+
+        try:
+            result = self._parse_json(response.text)
+        except json.JSONDecodeError as e:
+            print(f"JSON parse error in {method}: {e}")
+            print(f"Response text: {response.text[:200]}")
+            return on_parse_error(response.text)
+        except Exception as e:
+            print(f"Error in {method}: {e}")
+            return on_error(e)
+
+        self._cache_set(cache_key, result)
+        return result
+
+    def explain_procurement(self, procurement: Dict[str, Any], throttle: bool = False) -> Dict[str, Any]:
+        """
+        Explain a procurement in simple terms for public understanding
+
+        Args:
+            procurement: Procurement document
+            throttle: Pace the Gemini call (set by explain_procurements_bulk)
+
+        Returns:
+            Dict with explanation, key_points, and potential_concerns
+        """
+        if not self.is_available():
             return {
-                "suggestions": [{"suggestion": response.text[:500]}],
+                "error": "AI service not available",
+                "explanation": "AI explanations are currently unavailable. Please check the procurement details manually."
+            }
+
+        values = {
+            'title': procurement.get('title'),
+            'category': procurement.get('category'),
+            'department': procurement.get('department', 'Not specified'),
+            'currency': procurement.get('currency', 'USD'),
+            'estimated_value': procurement.get('estimated_value', 0),
+            'status': procurement.get('status'),
+            'description': _clip(procurement.get('description', 'No description provided'))
+        }
+
+        return self._call(
+            'explain_procurement', lambda: _EXPLAIN_TEMPLATE.format_map(values), ExplainSchema,
+            on_parse_error=lambda text: {
+                "simple_explanation": text[:500],
+                "key_points": ["AI analysis available but format error occurred"],
                 "error": "JSON parsing error"
+            },
+            on_error=lambda e: {
+                "error": str(e),
+                "explanation": "Unable to generate AI explanation at this time."
+            },
+            throttle=throttle
+        )
+
+    def explain_procurements_bulk(self, procurements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Explain several procurements with concurrent, throttled Gemini calls
+
+        Args:
+            procurements: Procurement documents
+
+        Returns:
+            Explanations in the same order as procurements
+        """
+        if not procurements:
+            return []
+
+        return list(BULK_EXECUTOR.map(lambda p: self.explain_procurement(p, throttle=True), procurements))
+
+    def analyze_anomaly(self, anomaly: Dict[str, Any], procurement: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Explain an anomaly in understandable terms
+
+        Args:
+            anomaly: Anomaly document
+            procurement: Related procurement (optional)
+
+        Returns:
+            Dict with explanation and recommendations
+        """
+        if not self.is_available():
+            return {
+                "error": "AI service not available",
+                "explanation": "AI analysis is currently unavailable."
             }
-        except Exception as e:
-            print(f"Error in suggest_improvements: {e}")
+
+        def render_prompt() -> str:
+            procurement_context = ""
+            if procurement:
+                procurement_context = _ANOMALY_PROCUREMENT_CONTEXT.format_map({
+                    'title': procurement.get('title'),
+                    'currency': procurement.get('currency', 'USD'),
+                    'estimated_value': procurement.get('estimated_value', 0),
+                    'department': procurement.get('department', 'Not specified')
+                })
+
+            return _ANOMALY_TEMPLATE.format_map({
+                'anomaly_type': anomaly.get('anomaly_type'),
+                'severity': anomaly.get('severity'),
+                'status': anomaly.get('status'),
+                'description': anomaly.get('description', 'No description'),
+                'procurement_context': procurement_context
+            })
+
+        return self._call(
+            'analyze_anomaly', render_prompt, AnomalySchema,
+            on_parse_error=lambda text: {
+                "what_happened": text[:500],
+                "error": "JSON parsing error"
+            },
+            on_error=lambda e: {
+                "error": str(e),
+                "explanation": "Unable to generate AI analysis at this time."
+            }
+        )
+
+    def verify_vendor(self, vendor_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Analyze vendor information for potential issues
+
+        Args:
+            vendor_data: Vendor information to verify
+
+        Returns:
+            Dict with verification results and risk assessment
+        """
+        if not self.is_available():
             return {
+                "error": "AI service not available",
+                "verification_status": "manual_review_required"
+            }
+
+        values = {field: vendor_data.get(field, 'Not provided') for field in _VENDOR_FIELDS}
+
+        return self._call(
+            'verify_vendor', lambda: _VENDOR_TEMPLATE.format_map(values), VendorSchema,
+            on_parse_error=lambda text: {
+                "risk_level": "medium",
+                "overall_assessment": text[:500],
+                "error": "JSON parsing error"
+            },
+            on_error=lambda e: {
                 "error": str(e),
+                "verification_status": "error",
+                "risk_level": "unknown"
+            }
+        )
+
+    def suggest_improvements(self, procurement: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Suggest improvements to make procurement more transparent and competitive
+
+        Args:
+            procurement: Procurement document
+
+        Returns:
+            Dict with suggestions for improvement
+        """
+        if not self.is_available():
+            return {
+                "error": "AI service not available",
                 "suggestions": []
             }
 
+        values = {
+            'title': procurement.get('title'),
+            'description': _clip(procurement.get('description', 'No description')),
+            'category': procurement.get('category'),
+            'currency': procurement.get('currency', 'USD'),
+            'estimated_value': procurement.get('estimated_value', 0),
+            'required_documents': len(procurement.get('required_documents', [])),
+            'evaluation_criteria': len(procurement.get('evaluation_criteria', [])),
+            'eligibility_criteria': len(procurement.get('eligibility_criteria', []))
+        }
+
+        return self._call(
+            'suggest_improvements', lambda: _IMPROVEMENTS_TEMPLATE.format_map(values), ImprovementsSchema,
+            on_parse_error=lambda text: {
+                "suggestions": [{"suggestion": text[:500]}],
+                "error": "JSON parsing error"
+            },
+            on_error=lambda e: {
+                "error": str(e),
+                "suggestions": []
+            }
+        )
 
 # Global service instance
 ai_service = AIService()
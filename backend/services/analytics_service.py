@@ -9,52 +9,393 @@ Provides comprehensive analytics and reporting for procurement data including:
 - Department-wise analysis
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from functools import wraps
+from typing import Dict, List, Any, Optional
 from bson import ObjectId
+from pymongo import ReadPreference
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from config.database import db
-from collections import defaultdict
+from config.settings import get_config
+from models.anomaly import AnomalyModel
+import hashlib
+import json
+
+
+# Rollup collections refreshed with $merge; dashboard getters read these
+# instead of re-aggregating procurements on every request
+ROLLUP_MONTHLY_SPEND = 'analytics_monthly_spend'
+ROLLUP_CATEGORY = 'analytics_category'
+ROLLUP_DEPARTMENT = 'analytics_department'
+ROLLUP_STATUS = 'analytics_status'
+
+# Shared by every get_key_metrics call to overlap its three round-trips
+KEY_METRICS_EXECUTOR = ThreadPoolExecutor(max_workers=3, thread_name_prefix='analytics-metrics')
+
+# A refresh holds the analytics_meta lease this long, so concurrent
+# callers never run overlapping refreshes
+ROLLUP_LEASE_SECONDS = 300
+
+# Rollup source pipelines over procurements, built once at import
+MONTHLY_SPEND_PIPELINE = [
+    {
+        '$match': {
+            'created_at': {'$type': 'date'},
+            'status': {'$in': ['published', 'awarded', 'completed']}
+        }
+    },
+    {
+        '$group': {
+            '_id': {
+                'year': {'$year': '$created_at'},
+                'month': {'$month': '$created_at'}
+            },
+            'total_value': {'$sum': '$estimated_value'},
+            'awarded_value': {'$sum': '$awarded_amount'},
+            'count': {'$sum': 1}
+        }
+    }
+]
+
+CATEGORY_PIPELINE = [
+    {
+        '$group': {
+            '_id': '$category',
+            'count': {'$sum': 1},
+            'total_value': {'$sum': '$estimated_value'},
+            'avg_value': {'$avg': '$estimated_value'}
+        }
+    }
+]
+
+DEPARTMENT_PIPELINE = [
+    {
+        '$group': {
+            '_id': '$creator_department',
+            'count': {'$sum': 1},
+            'total_value': {'$sum': '$estimated_value'},
+            'avg_value': {'$avg': '$estimated_value'}
+        }
+    }
+]
+
+STATUS_PIPELINE = [
+    {
+        '$group': {
+            '_id': '$status',
+            'count': {'$sum': 1}
+        }
+    }
+]
+
+# get_vendor_performance appends its $limit
+VENDOR_PERFORMANCE_PIPELINE = [
+    {
+        '$match': {
+            'performance_metrics': {'$exists': True}
+        }
+    },
+    {
+        '$project': {
+            'name': 1,
+            'total_contracts': '$performance_metrics.total_contracts',
+            'total_value': '$performance_metrics.total_value',
+            'completion_rate': '$performance_metrics.completion_rate',
+            'average_rating': '$performance_metrics.average_rating'
+        }
+    },
+    {
+        '$sort': {'total_value': -1}
+    }
+]
+
+# Severity breakdown and per-type severity pivot in one pass; rows come
+# back already shaped for the stacked bar chart
+ANOMALY_BREAKDOWN_PIPELINE = [
+    {
+        '$facet': {
+            'by_severity': [
+                {
+                    '$group': {
+                        '_id': '$severity',
+                        'count': {'$sum': 1},
+                        'avg_risk_score': {'$avg': '$risk_score'}
+                    }
+                }
+            ],
+            'by_type': [
+                {
+                    '$group': {
+                        '_id': {'$ifNull': ['$anomaly_type', 'unknown']},
+                        **{
+                            severity: {
+                                '$sum': {'$cond': [{'$eq': [{'$ifNull': ['$severity', 'low']}, severity]}, 1, 0]}
+                            }
+                            for severity in AnomalyModel.VALID_SEVERITIES
+                        }
+                    }
+                }
+            ]
+        }
+    }
+]
+
+# get_key_metrics $facet branches that do not depend on the current date
+KEY_METRICS_FACETS = {
+    # Total procurement value
+    'totals': [
+        {
+            '$group': {
+                '_id': None,
+                'total': {'$sum': '$estimated_value'},
+                'awarded': {'$sum': '$awarded_amount'}
+            }
+        }
+    ],
+    # Average processing time
+    'processing': [
+        {
+            '$match': {
+                'status': {'$in': ['awarded', 'completed']},
+                'published_date': {'$exists': True},
+                'awarded_date': {'$exists': True}
+            }
+        },
+        {
+            '$project': {
+                'processing_days': {
+                    '$divide': [
+                        {'$subtract': ['$awarded_date', '$published_date']},
+                        1000 * 60 * 60 * 24
+                    ]
+                }
+            }
+        },
+        {
+            '$group': {
+                '_id': None,
+                'avg_days': {'$avg': '$processing_days'}
+            }
+        }
+    ],
+    # Counts
+    'total_count': [
+        {'$count': 'n'}
+    ],
+    'active_count': [
+        {'$match': {'status': {'$in': ['published', 'evaluation']}}},
+        {'$count': 'n'}
+    ]
+}
+
+# This month's value, after the per-call created_at $match
+MONTH_VALUE_GROUP = {
+    '$group': {
+        '_id': None,
+        'total': {'$sum': '$estimated_value'}
+    }
+}
+
+# Procurement fields read by get_timeline_data
+TIMELINE_PROJECTION = {
+    'tender_number': 1,
+    'title': 1,
+    'status': 1,
+    'created_at': 1,
+    'updated_at': 1,
+    'published_date': 1,
+    'deadline': 1,
+    'awarded_date': 1,
+    'awarded_vendor_id': 1
+}
+
+
+def cached(func):
+    """
+    Cache a getter's result in analytics_cache for CACHE_TTL_DASHBOARD seconds
+
+    Keyed by method name and arguments; entries expire through the
+    collection's TTL index, so writes are picked up within one TTL.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        args_digest = hashlib.sha256(
+            json.dumps([args, kwargs], sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        key = f"analytics:{func.__name__}:{args_digest}"
+        now = datetime.utcnow()
+
+        try:
+            hit = self.cache.find_one({'cache_key': key, 'expires_at': {'$gt': now}}, {'value': 1})
+            if hit:
+                return hit['value']
+        except PyMongoError as e:
+            print(f"Analytics cache read failed: {e}")
+
+        value = func(self, *args, **kwargs)
+
+        try:
+            self.cache.update_one(
+                {'cache_key': key},
+                {'$set': {'value': value, 'created_at': now, 'expires_at': now + self.cache_ttl}},
+                upsert=True
+            )
+        except PyMongoError as e:
+            print(f"Analytics cache write failed: {e}")
+
+        return value
+
+    return wrapper
 
 
 class AnalyticsService:
     def __init__(self):
-        self.procurements = db.procurements
-        self.vendors = db.vendors
-        self.anomalies = db.anomalies
-        self.users = db.users
+        # Dashboard scans of the source collections tolerate replication lag,
+        # so they go to a secondary when one is available. Rollups are read
+        # from the primary: they are small, and a lagging secondary right
+        # after a refresh would serve stale rows that @cached then keeps
+        self.reads = db.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+        self.rollups = db
+        self.procurements = self.reads.procurements
+        self.vendors = self.reads.vendors
+        self.anomalies = self.reads.anomalies
+        self.users = self.reads.users
+        self.rollup_meta = db.analytics_meta
+        self.rollup_max_age = timedelta(seconds=get_config().CACHE_TTL_ANALYTICS)
+        self.cache = db.analytics_cache
+        self.cache_ttl = timedelta(seconds=get_config().CACHE_TTL_DASHBOARD)
+
+    @staticmethod
+    def _merge_into(collection: str) -> Dict[str, Any]:
+        """$merge stage that replaces each rollup row by _id"""
+        return {
+            '$merge': {
+                'into': collection,
+                'on': '_id',
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }
+        }
+
+    def _refresh_rollup(self, collection: str, pipeline: List[Dict], now: datetime) -> None:
+        """Materialize pipeline into collection and drop rows it no longer produces"""
+        db.procurements.aggregate(pipeline + [
+            {'$set': {'refreshed_at': now}},
+            self._merge_into(collection)
+        ])
+        db[collection].delete_many({'refreshed_at': {'$lt': now}})
+
+    def _acquire_refresh_lease(self, now: datetime, stale_before: Optional[datetime] = None) -> bool:
+        """
+        Claim the rollup refresh lease on analytics_meta
+
+        Args:
+            now: Current time
+            stale_before: Only claim when rollups were refreshed before this
+
+        Returns:
+            True if this caller should refresh
+        """
+        query = {'_id': 'rollups', 'lease_until': {'$not': {'$gt': now}}}
+
+        if stale_before is not None:
+            query['$or'] = [
+                {'refreshed_at': {'$exists': False}},
+                {'refreshed_at': {'$lt': stale_before}}
+            ]
+
+        try:
+            # Upsert covers the first ever refresh; when the document exists
+            # but the filter does not match, the insert hits the _id key
+            self.rollup_meta.find_one_and_update(
+                query,
+                {'$set': {'lease_until': now + timedelta(seconds=ROLLUP_LEASE_SECONDS)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def refresh_rollups(self, stale_before: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Recompute all procurement rollup collections
+
+        Rollups are recomputed in full: status and award changes update
+        existing procurements, so a created_at watermark would miss them.
+        Runs from scripts/refresh_analytics.py; the lease keeps a request-path
+        refresh from overlapping it.
+
+        Args:
+            stale_before: Skip unless rollups were refreshed before this
+
+        Returns:
+            Refresh timestamp, or None if another caller holds the lease
+            or the rollups are fresh
+        """
+        now = datetime.utcnow()
+
+        if not self._acquire_refresh_lease(now, stale_before):
+            return None
+
+        try:
+            self._refresh_rollup(ROLLUP_MONTHLY_SPEND, MONTHLY_SPEND_PIPELINE, now)
+            self._refresh_rollup(ROLLUP_CATEGORY, CATEGORY_PIPELINE, now)
+            self._refresh_rollup(ROLLUP_DEPARTMENT, DEPARTMENT_PIPELINE, now)
+            self._refresh_rollup(ROLLUP_STATUS, STATUS_PIPELINE, now)
+
+            self.rollup_meta.update_one(
+                {'_id': 'rollups'},
+                {'$set': {'refreshed_at': now}, '$unset': {'lease_until': ''}}
+            )
+        except PyMongoError:
+            self.rollup_meta.update_one({'_id': 'rollups'}, {'$unset': {'lease_until': ''}})
+            raise
+
+        self.invalidate_cache()
+
+        return now
+
+    def invalidate_cache(self) -> int:
+        """
+        Drop cached analytics results ahead of their TTL
+
+        Returns:
+            Number of cache entries removed
+        """
+        result = self.cache.delete_many({'cache_key': {'$regex': '^analytics:'}})
+        return result.deleted_count
+
+    def _ensure_rollups(self) -> None:
+        """
+        Fallback for when the scheduled refresh has not run
+
+        Rollups missing or older than CACHE_TTL_ANALYTICS are refreshed by
+        whichever request wins the lease; the others read the existing rows.
+        """
+        meta = self.rollup_meta.find_one({'_id': 'rollups'}, {'refreshed_at': 1})
+        stale_before = datetime.utcnow() - self.rollup_max_age
 
+        if not meta or not meta.get('refreshed_at') or meta['refreshed_at'] < stale_before:
+            self.refresh_rollups(stale_before=stale_before)
+
+    @cached
     def get_spending_trends(self, days: int = 365) -> List[Dict[str, Any]]:
         """
         Get procurement spending trends over time
         Returns monthly aggregated data for charts
         """
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
-
-        pipeline = [
-            {
-                '$match': {
-                    'created_at': {'$gte': start_date, '$lte': end_date},
-                    'status': {'$in': ['published', 'awarded', 'completed']}
-                }
-            },
-            {
-                '$group': {
-                    '_id': {
-                        'year': {'$year': '$created_at'},
-                        'month': {'$month': '$created_at'}
-                    },
-                    'total_value': {'$sum': '$estimated_value'},
-                    'awarded_value': {'$sum': '$awarded_amount'},
-                    'count': {'$sum': 1}
-                }
-            },
-            {
-                '$sort': {'_id.year': 1, '_id.month': 1}
-            }
-        ]
+        self._ensure_rollups()
 
-        results = list(self.procurements.aggregate(pipeline))
+        # Rollups are monthly, so the first month is counted in full
+        start_date = datetime.utcnow() - timedelta(days=days)
+
+        results = list(self.rollups[ROLLUP_MONTHLY_SPEND].find({
+            '$or': [
+                {'_id.year': {'$gt': start_date.year}},
+                {'_id.year': start_date.year, '_id.month': {'$gte': start_date.month}}
+            ]
+        }).sort([('_id.year', 1), ('_id.month', 1)]))
 
         # Format for frontend
         trends = []
@@ -71,26 +412,15 @@ class AnalyticsService:
 
         return trends
 
+    @cached
     def get_category_distribution(self) -> List[Dict[str, Any]]:
         """
         Get procurement distribution by category
         Returns data for pie/donut charts
         """
-        pipeline = [
-            {
-                '$group': {
-                    '_id': '$category',
-                    'count': {'$sum': 1},
-                    'total_value': {'$sum': '$estimated_value'},
-                    'avg_value': {'$avg': '$estimated_value'}
-                }
-            },
-            {
-                '$sort': {'total_value': -1}
-            }
-        ]
+        self._ensure_rollups()
 
-        results = list(self.procurements.aggregate(pipeline))
+        results = list(self.rollups[ROLLUP_CATEGORY].find().sort('total_value', -1))
 
         return [{
             'category': result['_id'] or 'Unknown',
@@ -99,33 +429,13 @@ class AnalyticsService:
             'avg_value': result['avg_value'] or 0
         } for result in results]
 
+    @cached
     def get_vendor_performance(self, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get top vendor performance metrics
         Returns data for bar charts
         """
-        pipeline = [
-            {
-                '$match': {
-                    'performance_metrics': {'$exists': True}
-                }
-            },
-            {
-                '$project': {
-                    'name': 1,
-                    'total_contracts': '$performance_metrics.total_contracts',
-                    'total_value': '$performance_metrics.total_value',
-                    'completion_rate': '$performance_metrics.completion_rate',
-                    'average_rating': '$performance_metrics.average_rating'
-                }
-            },
-            {
-                '$sort': {'total_value': -1}
-            },
-            {
-                '$limit': limit
-            }
-        ]
+        pipeline = VENDOR_PERFORMANCE_PIPELINE + [{'$limit': limit}]
 
         results = list(self.vendors.aggregate(pipeline))
 
@@ -138,124 +448,60 @@ class AnalyticsService:
             'rating': result.get('average_rating', 0)
         } for result in results]
 
+    @cached
     def get_anomaly_breakdown(self) -> Dict[str, Any]:
         """
         Get anomaly statistics by severity and type
         Returns data for stacked bar charts
         """
-        # Severity breakdown
-        severity_pipeline = [
-            {
-                '$group': {
-                    '_id': '$severity',
-                    'count': {'$sum': 1},
-                    'avg_risk_score': {'$avg': '$risk_score'}
-                }
-            }
-        ]
-
-        severity_results = list(self.anomalies.aggregate(severity_pipeline))
-
-        # Type breakdown
-        type_pipeline = [
-            {
-                '$group': {
-                    '_id': {
-                        'type': '$anomaly_type',
-                        'severity': '$severity'
-                    },
-                    'count': {'$sum': 1}
-                }
-            }
-        ]
-
-        type_results = list(self.anomalies.aggregate(type_pipeline))
-
-        # Format for stacked bar chart
-        types = defaultdict(lambda: {'low': 0, 'medium': 0, 'high': 0, 'critical': 0})
-        for result in type_results:
-            anomaly_type = result['_id'].get('type') or 'unknown'
-            severity = result['_id'].get('severity') or 'low'
-            types[anomaly_type][severity] = result['count']
+        facets = next(self.anomalies.aggregate(ANOMALY_BREAKDOWN_PIPELINE))
 
         return {
             'by_severity': [{
                 'severity': result['_id'] or 'Unknown',
                 'count': result['count'],
                 'avg_risk_score': round(result['avg_risk_score'] or 0, 2)
-            } for result in severity_results],
+            } for result in facets['by_severity']],
             'by_type': [{
-                'type': anom_type,
-                **counts
-            } for anom_type, counts in types.items()]
+                'type': result.pop('_id'),
+                **result
+            } for result in facets['by_type']]
         }
 
+    @cached
     def get_key_metrics(self) -> Dict[str, Any]:
         """
         Get key performance indicators
         """
-        # Total procurement value
-        total_value_pipeline = [
-            {
-                '$group': {
-                    '_id': None,
-                    'total': {'$sum': '$estimated_value'},
-                    'awarded': {'$sum': '$awarded_amount'}
-                }
-            }
-        ]
-        total_value = list(self.procurements.aggregate(total_value_pipeline))
-
-        # This month's value
         start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        month_value_pipeline = [
-            {
-                '$match': {
-                    'created_at': {'$gte': start_of_month}
-                }
-            },
-            {
-                '$group': {
-                    '_id': None,
-                    'total': {'$sum': '$estimated_value'}
-                }
-            }
-        ]
-        month_value = list(self.procurements.aggregate(month_value_pipeline))
-
-        # Average processing time
-        processing_time_pipeline = [
-            {
-                '$match': {
-                    'status': {'$in': ['awarded', 'completed']},
-                    'published_date': {'$exists': True},
-                    'awarded_date': {'$exists': True}
-                }
-            },
-            {
-                '$project': {
-                    'processing_days': {
-                        '$divide': [
-                            {'$subtract': ['$awarded_date', '$published_date']},
-                            1000 * 60 * 60 * 24
-                        ]
-                    }
-                }
-            },
-            {
-                '$group': {
-                    '_id': None,
-                    'avg_days': {'$avg': '$processing_days'}
-                }
+
+        # One pass over procurements for every procurement KPI; only the
+        # month facet depends on the call time
+        pipeline = [{
+            '$facet': {
+                **KEY_METRICS_FACETS,
+                'month': [{'$match': {'created_at': {'$gte': start_of_month}}}, MONTH_VALUE_GROUP]
             }
-        ]
-        processing_time = list(self.procurements.aggregate(processing_time_pipeline))
+        }]
 
-        # Counts
-        total_procurements = self.procurements.count_documents({})
-        active_procurements = self.procurements.count_documents({'status': {'$in': ['published', 'evaluation']}})
-        total_vendors = self.vendors.count_documents({})
-        high_risk_anomalies = self.anomalies.count_documents({'risk_score': {'$gte': 70}, 'status': 'pending'})
+        # The three collections are independent; overlap their round-trips
+        facets_future = KEY_METRICS_EXECUTOR.submit(lambda: next(self.procurements.aggregate(pipeline)))
+        vendors_future = KEY_METRICS_EXECUTOR.submit(self.vendors.count_documents, {})
+        anomalies_future = KEY_METRICS_EXECUTOR.submit(
+            self.anomalies.count_documents,
+            {'risk_score': {'$gte': 70}, 'status': 'pending'}
+        )
+
+        facets = facets_future.result()
+        total_vendors = vendors_future.result()
+        high_risk_anomalies = anomalies_future.result()
+
+        total_value = facets['totals']
+        month_value = facets['month']
+        processing_time = facets['processing']
+
+        total_procurements = facets['total_count'][0]['n'] if facets['total_count'] else 0
+        active_procurements = facets['active_count'][0]['n'] if facets['active_count'] else 0
 
         return {
             'total_value': total_value[0]['total'] if total_value else 0,
@@ -268,39 +514,14 @@ class AnalyticsService:
             'high_risk_anomalies': high_risk_anomalies
         }
 
+    @cached
     def get_department_analysis(self) -> List[Dict[str, Any]]:
         """
         Get spending analysis by department
         """
-        pipeline = [
-            {
-                '$lookup': {
-                    'from': 'users',
-                    'localField': 'created_by',
-                    'foreignField': '_id',
-                    'as': 'creator'
-                }
-            },
-            {
-                '$unwind': {
-                    'path': '$creator',
-                    'preserveNullAndEmptyArrays': True
-                }
-            },
-            {
-                '$group': {
-                    '_id': '$creator.department',
-                    'count': {'$sum': 1},
-                    'total_value': {'$sum': '$estimated_value'},
-                    'avg_value': {'$avg': '$estimated_value'}
-                }
-            },
-            {
-                '$sort': {'total_value': -1}
-            }
-        ]
+        self._ensure_rollups()
 
-        results = list(self.procurements.aggregate(pipeline))
+        results = list(self.rollups[ROLLUP_DEPARTMENT].find().sort('total_value', -1))
 
         return [{
             'department': result['_id'] or 'Unknown',
@@ -309,20 +530,14 @@ class AnalyticsService:
             'avg_value': result['avg_value'] or 0
         } for result in results]
 
+    @cached
     def get_status_distribution(self) -> List[Dict[str, Any]]:
         """
         Get procurement distribution by status
         """
-        pipeline = [
-            {
-                '$group': {
-                    '_id': '$status',
-                    'count': {'$sum': 1}
-                }
-            }
-        ]
+        self._ensure_rollups()
 
-        results = list(self.procurements.aggregate(pipeline))
+        results = list(self.rollups[ROLLUP_STATUS].find())
 
         return [{
             'status': result['_id'] or 'Unknown',
@@ -333,7 +548,7 @@ class AnalyticsService:
         """
         Get detailed timeline for a procurement
         """
-        procurement = self.procurements.find_one({'_id': ObjectId(procurement_id)})
+        procurement = self.procurements.find_one({'_id': ObjectId(procurement_id)}, TIMELINE_PROJECTION)
 
         if not procurement:
             return None
@@ -1,12 +1,19 @@
 """Anomaly detection service with AI integration"""
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReadPreference
 from config.database import db
 from models.anomaly import AnomalyModel
 from services.gemini_service import gemini_service
 from services.procurement_service import procurement_service
-from utils.db_helpers import serialize_document, get_object_id, paginate_query
+from utils.db_helpers import serialize_document, serialize_cursor, get_object_id, paginate_query, supports_transactions
+
+
+# Concurrent Gemini calls across all detect_and_create_anomalies_batch requests
+BATCH_MAX_WORKERS = 8
+BATCH_EXECUTOR = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='anomaly-batch')
 
 
 class AnomalyService:
@@ -14,6 +21,8 @@ class AnomalyService:
 
     def __init__(self):
         self.collection = db.anomalies
+        # Listings and statistics tolerate replication lag
+        self._read_collection = self.collection.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
 
     def detect_and_create_anomalies(self, procurement_id: str) -> Dict:
         """
@@ -40,19 +49,27 @@ class AnomalyService:
 
         risk_score = gemini_result.get('risk_score', 0)
 
-        # Update procurement metadata
-        procurement_service.update_ai_metadata(procurement_id, gemini_result, risk_score)
-
         # Create anomaly flags if risk score is significant
-        anomalies_created = 0
+        anomaly_records = []
 
         if risk_score > 30:  # Threshold for creating anomaly flags
             proc_obj_id = get_object_id(procurement_id)
             anomaly_records = AnomalyModel.create_from_gemini_analysis(proc_obj_id, gemini_result)
 
+        def save_analysis(session=None):
+            procurement_service.update_ai_metadata(procurement_id, gemini_result, risk_score, session=session)
             if anomaly_records:
-                self.collection.insert_many(anomaly_records)
-                anomalies_created = len(anomaly_records)
+                self.collection.insert_many(anomaly_records, session=session)
+
+        # Metadata and flags are committed together where transactions are
+        # available (replica set or sharded cluster)
+        if supports_transactions(db.client):
+            with db.client.start_session() as session:
+                session.with_transaction(save_analysis)
+        else:
+            save_analysis()
+
+        anomalies_created = len(anomaly_records)
 
         return {
             'success': True,
@@ -61,6 +78,72 @@ class AnomalyService:
             'analysis': gemini_result
         }
 
+    def detect_and_create_anomalies_batch(self, procurement_ids: List[str]) -> Dict:
+        """
+        Detect anomalies for many procurements at once
+
+        Procurements and their category history are loaded in one query
+        each, Gemini runs concurrently, and the results are written with one
+        bulk_write and one insert_many.
+
+        Args:
+            procurement_ids: Procurement IDs to analyze
+
+        Returns:
+            Dictionary with per-procurement results
+        """
+        obj_ids = [obj_id for obj_id in (get_object_id(pid) for pid in procurement_ids) if obj_id]
+        procurements = serialize_document(list(procurement_service.collection.find({'_id': {'$in': obj_ids}})))
+
+        if not procurements:
+            return {'error': 'Procurements not found', 'anomalies_created': 0}
+
+        # Historical data for comparison, one query for every category
+        history = procurement_service.get_by_categories({p.get('category') for p in procurements}, limit=100)
+
+        def analyze(procurement):
+            return gemini_service.detect_anomalies(procurement, history.get(procurement.get('category'), []))
+
+        gemini_results = list(BATCH_EXECUTOR.map(analyze, procurements))
+
+        risk_scores = {}
+        anomaly_records = []
+        results = []
+
+        for procurement, gemini_result in zip(procurements, gemini_results):
+            risk_score = gemini_result.get('risk_score', 0)
+            risk_scores[procurement['_id']] = risk_score
+
+            # Create anomaly flags if risk score is significant
+            records = []
+            if risk_score > 30:
+                records = AnomalyModel.create_from_gemini_analysis(ObjectId(procurement['_id']), gemini_result)
+                anomaly_records.extend(records)
+
+            results.append({
+                'procurement_id': procurement['_id'],
+                'risk_score': risk_score,
+                'anomalies_created': len(records),
+                'analysis': gemini_result
+            })
+
+        def save_analysis(session=None):
+            procurement_service.update_ai_metadata_bulk(risk_scores, session=session)
+            if anomaly_records:
+                self.collection.insert_many(anomaly_records, session=session)
+
+        if supports_transactions(db.client):
+            with db.client.start_session() as session:
+                session.with_transaction(save_analysis)
+        else:
+            save_analysis()
+
+        return {
+            'success': True,
+            'anomalies_created': len(anomaly_records),
+            'results': results
+        }
+
     def get_anomaly_by_id(self, anomaly_id: str) -> Optional[Dict]:
         """
         Get anomaly flag by ID
@@ -97,7 +180,7 @@ class AnomalyService:
 
         records = self.collection.find({'procurement_id': proc_obj_id}).sort('flagged_at', -1)
 
-        return serialize_document(list(records))
+        return serialize_cursor(records)
 
     def list_anomalies(
         self,
@@ -132,7 +215,7 @@ class AnomalyService:
             query['risk_score'] = {'$gte': min_risk_score}
 
         return paginate_query(
-            self.collection,
+            self._read_collection,
             query,
             page=page,
             limit=limit,
@@ -190,7 +273,7 @@ class AnomalyService:
             'status': {'$in': ['pending', 'investigating']}
         }).sort('risk_score', -1).limit(limit)
 
-        return serialize_document(list(records))
+        return serialize_cursor(records)
 
     def get_statistics(self) -> Dict:
         """
@@ -199,24 +282,39 @@ class AnomalyService:
         Returns:
             Dictionary with statistics
         """
+        # Status and severity breakdowns in a single pass over anomalies
         pipeline = [
             {
-                '$group': {
-                    '_id': '$status',
-                    'count': {'$sum': 1},
-                    'avg_risk_score': {'$avg': '$risk_score'}
+                '$facet': {
+                    'by_status': [
+                        {
+                            '$group': {
+                                '_id': '$status',
+                                'count': {'$sum': 1},
+                                'avg_risk_score': {'$avg': '$risk_score'}
+                            }
+                        }
+                    ],
+                    'by_severity': [
+                        {
+                            '$group': {
+                                '_id': '$severity',
+                                'count': {'$sum': 1}
+                            }
+                        }
+                    ]
                 }
             }
         ]
 
-        results = list(self.collection.aggregate(pipeline))
+        facets = next(self._read_collection.aggregate(pipeline))
 
         stats = {
             'by_status': {},
             'total_anomalies': 0
         }
 
-        for item in results:
+        for item in facets['by_status']:
             status = item['_id']
             stats['by_status'][status] = {
                 'count': item['count'],
@@ -224,18 +322,7 @@ class AnomalyService:
             }
             stats['total_anomalies'] += item['count']
 
-        # Add severity breakdown
-        severity_pipeline = [
-            {
-                '$group': {
-                    '_id': '$severity',
-                    'count': {'$sum': 1}
-                }
-            }
-        ]
-
-        severity_results = list(self.collection.aggregate(severity_pipeline))
-        stats['by_severity'] = {item['_id']: item['count'] for item in severity_results}
+        stats['by_severity'] = {item['_id']: item['count'] for item in facets['by_severity']}
 
         return stats
 
@@ -1,16 +1,170 @@
 """Audit logging service for tracking all system actions"""
-from typing import Dict, Optional
-from datetime import datetime
-from flask import request, g
+import atexit
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from bson import ObjectId
+from flask import request, g, has_app_context, has_request_context
+from pymongo import ReadPreference
+from pymongo.errors import BulkWriteError, PyMongoError
 from config.database import db
-from utils.db_helpers import serialize_document, paginate_query
+from utils.db_helpers import serialize_cursor, paginate_query
+
+
+# Per-user, per-day event counts refreshed from audit_logs with $merge
+AUDIT_ROLLUP_DAILY = 'audit_rollup_daily'
 
 
 class AuditService:
     """Service for comprehensive audit logging"""
 
+    # Buffered records are written with insert_many every FLUSH_INTERVAL
+    # seconds, or sooner once FLUSH_BATCH_SIZE records are waiting
+    FLUSH_INTERVAL = 0.5
+    FLUSH_BATCH_SIZE = 100
+    # Past this, log_action writes synchronously instead of buffering
+    MAX_BUFFERED = 10000
+    # Failed records are retried on later flushes up to this many times
+    MAX_FLUSH_ATTEMPTS = 3
+
     def __init__(self):
+        # Log readers flush the buffer and then read from the primary, so the
+        # records they just flushed are visible
         self.collection = db.audit_logs
+        # The rollup is only as fresh as its last refresh; replication lag is fine
+        self._read_rollup = db[AUDIT_ROLLUP_DAILY].with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+        self._buffer = deque()
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher = None
+        atexit.register(self.flush)
+
+    def _ensure_flusher(self) -> None:
+        """Start the background flush thread on first use"""
+        if self._flusher is not None:
+            return
+
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='audit-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        """Flush on a timer, or early when the buffer reaches FLUSH_BATCH_SIZE"""
+        while True:
+            self._wakeup.wait(self.FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write all buffered audit records
+
+        audit_logs may be a time-series collection, which does not enforce
+        unique _ids, so a retried record must never have been written. The
+        batch is inserted in order: on a write error only the unwritten
+        tail is requeued, and on any other error the client-side _ids are
+        checked to find which records actually landed.
+
+        Returns:
+            Number of records written
+        """
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+
+        if not batch:
+            return 0
+
+        try:
+            self.collection.insert_many(batch)
+        except BulkWriteError as e:
+            failed = batch[e.details.get('nInserted', 0):]
+            print(f"Audit log flush failed for {len(failed)} of {len(batch)} records: {e}")
+            self._requeue(batch, failed)
+            return len(batch) - len(failed)
+        except PyMongoError as e:
+            failed = self._unwritten(batch)
+            print(f"Audit log flush failed, requeueing {len(failed)} of {len(batch)} records: {e}")
+            self._requeue(batch, failed)
+            return len(batch) - len(failed)
+
+        self._requeue(batch, [])
+        return len(batch)
+
+    def _unwritten(self, batch: List[Dict]) -> List[Dict]:
+        """
+        Find the records in a batch whose insert did not reach the server
+
+        Args:
+            batch: Records from a flush that failed without per-record results
+
+        Returns:
+            Records not found by _id; the whole batch if the lookup also fails
+        """
+        try:
+            written = {
+                doc['_id']
+                for doc in self.collection.find(
+                    {
+                        # Bounds the time-series bucket scan to the batch's window
+                        'created_at': {
+                            '$gte': min(record['created_at'] for record in batch),
+                            '$lte': max(record['created_at'] for record in batch)
+                        },
+                        '_id': {'$in': [record['_id'] for record in batch]}
+                    },
+                    {'_id': 1}
+                )
+            }
+        except PyMongoError:
+            return batch
+
+        return [record for record in batch if record['_id'] not in written]
+
+    def _requeue(self, batch: List[Dict], failed: List[Dict]) -> None:
+        """
+        Put failed records back at the front of the buffer
+
+        Records that have used up MAX_FLUSH_ATTEMPTS, or that no longer fit
+        under MAX_BUFFERED, are dropped and counted in the log.
+
+        Args:
+            batch: Every record in the flushed batch
+            failed: Records from the batch that were not written
+        """
+        failed_ids = {record['_id'] for record in failed}
+        retry = []
+        exhausted = 0
+
+        with self._lock:
+            for record in batch:
+                if record['_id'] not in failed_ids:
+                    self._attempts.pop(record['_id'], None)
+                    continue
+
+                attempts = self._attempts.get(record['_id'], 0) + 1
+                if attempts < self.MAX_FLUSH_ATTEMPTS:
+                    self._attempts[record['_id']] = attempts
+                    retry.append(record)
+                else:
+                    self._attempts.pop(record['_id'], None)
+                    exhausted += 1
+
+            room = max(self.MAX_BUFFERED - len(self._buffer), 0)
+            overflow = max(len(retry) - room, 0)
+            for record in retry[room:]:
+                self._attempts.pop(record['_id'], None)
+
+            self._buffer.extendleft(reversed(retry[:room]))
+
+        if exhausted or overflow:
+            print(
+                f"✗ Dropped {exhausted + overflow} audit records "
+                f"({exhausted} out of retries, {overflow} over buffer limit)"
+            )
 
     def log_action(
         self,
@@ -21,11 +175,15 @@ class AuditService:
         resource_name: str = None,
         changes: Dict = None,
         user_id: str = None,
-        user_role: str = None
+        user_role: str = None,
+        flush: bool = False
     ) -> str:
         """
         Log system action to audit trail
 
+        The record is buffered and written in the next batch; the ID is
+        generated client-side so it can be returned immediately.
+
         Args:
             event_type: Type of event (authentication, procurement, document, etc.)
             action: Action performed (create, update, delete, view, etc.)
@@ -35,27 +193,32 @@ class AuditService:
             changes: Before/after changes
             user_id: User who performed action
             user_role: User role
+            flush: Write the buffer before returning
 
         Returns:
             Audit log ID
         """
         # Get user from Flask g if not provided
-        if not user_id and hasattr(g, 'user_id'):
-            user_id = g.user_id
-
-        if not user_role and hasattr(g, 'user_role'):
-            user_role = g.user_role
-
-        # Get request metadata
-        metadata = {
-            'ip_address': request.remote_addr if request else None,
-            'user_agent': request.headers.get('User-Agent') if request else None,
-            'method': request.method if request else None,
-            'endpoint': request.endpoint if request else None
-        }
+        if has_app_context():
+            ctx_g = g._get_current_object()
+            user_id = user_id or getattr(ctx_g, 'user_id', None)
+            user_role = user_role or getattr(ctx_g, 'user_role', None)
+
+        # Snapshot request metadata, resolving the context-local proxy once
+        if has_request_context():
+            req = request._get_current_object()
+            metadata = {
+                'ip_address': req.remote_addr,
+                'user_agent': req.headers.get('User-Agent'),
+                'method': req.method,
+                'endpoint': req.endpoint
+            }
+        else:
+            metadata = {'ip_address': None, 'user_agent': None, 'method': None, 'endpoint': None}
 
         # Create audit log record
         log_record = {
+            '_id': ObjectId(),
             'event_type': event_type,
             'user_id': user_id,
             'user_role': user_role,
@@ -70,9 +233,30 @@ class AuditService:
             'created_at': datetime.utcnow()
         }
 
-        result = self.collection.insert_one(log_record)
-
-        return str(result.inserted_id)
+        with self._lock:
+            pending = len(self._buffer)
+            buffered = pending < self.MAX_BUFFERED
+            if buffered:
+                self._buffer.append(log_record)
+                pending += 1
+
+        # Buffer full (writes are failing or falling behind): write this one directly
+        if not buffered:
+            self._wakeup.set()
+            try:
+                self.collection.insert_one(log_record)
+            except PyMongoError as e:
+                print(f"✗ Dropped 1 audit record, buffer full and write failed: {e}")
+            return str(log_record['_id'])
+
+        if flush:
+            self.flush()
+        else:
+            self._ensure_flusher()
+            if pending >= self.FLUSH_BATCH_SIZE:
+                self._wakeup.set()
+
+        return str(log_record['_id'])
 
     def log_authentication(self, user_id: str, action: str, success: bool, reason: str = None) -> str:
         """
@@ -93,7 +277,9 @@ class AuditService:
             resource_type='user',
             resource_id=user_id,
             changes={'success': success, 'reason': reason},
-            user_id=user_id
+            user_id=user_id,
+            # Failed authentication is written through for security review
+            flush=not success
         )
 
     def log_procurement_action(
@@ -202,6 +388,8 @@ class AuditService:
         Returns:
             Paginated audit logs
         """
+        self.flush()
+
         query = {}
 
         if event_type:
@@ -240,30 +428,100 @@ class AuditService:
         Returns:
             List of audit logs
         """
+        self.flush()
+
         logs = self.collection.find({
             'user_id': user_id
         }).sort('created_at', -1).limit(limit)
 
-        return serialize_document(list(logs))
+        return serialize_cursor(logs)
 
-    def get_resource_history(self, resource_type: str, resource_id: str) -> list:
+    def get_resource_history(self, resource_type: str, resource_id: str, limit: int = 1000) -> list:
         """
-        Get full history of actions on a resource
+        Get history of actions on a resource, newest first
 
         Args:
             resource_type: Type of resource
             resource_id: Resource ID
+            limit: Maximum results
 
         Returns:
             List of audit logs
         """
+        self.flush()
+
         logs = self.collection.find({
             'resource.type': resource_type,
             'resource.id': resource_id
-        }).sort('created_at', -1)
+        }).sort('created_at', -1).limit(limit)
+
+        return serialize_cursor(logs)
 
-        return serialize_document(list(logs))
 
+    def refresh_daily_rollup(self, days: int = 1) -> datetime:
+        """
+        Recompute daily per-user event counts for recent days
+
+        Whole UTC days are recomputed, so each replaced rollup row is
+        complete. Run nightly; a larger window repairs missed runs.
+
+        Args:
+            days: Number of past days to recompute, plus today
+
+        Returns:
+            Start of the recomputed window
+        """
+        self.flush()
+
+        start = (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        self.collection.aggregate([
+            {'$match': {'created_at': {'$gte': start}}},
+            {
+                '$group': {
+                    '_id': {
+                        'user_id': '$user_id',
+                        'day': {'$dateTrunc': {'date': '$created_at', 'unit': 'day'}},
+                        'event_type': '$event_type'
+                    },
+                    'count': {'$sum': 1}
+                }
+            },
+            {
+                '$merge': {
+                    'into': AUDIT_ROLLUP_DAILY,
+                    'on': '_id',
+                    'whenMatched': 'replace',
+                    'whenNotMatched': 'insert'
+                }
+            }
+        ])
+
+        return start
+
+    def get_user_activity_summary(self, user_id: str, days: int = 30) -> list:
+        """
+        Get a user's daily event counts from the rollup
+
+        Args:
+            user_id: User ID
+            days: Number of past days to include
+
+        Returns:
+            Event counts per day and event type, most recent day first
+        """
+        start = (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        rows = self._read_rollup.find({
+            '_id.user_id': user_id,
+            '_id.day': {'$gte': start}
+        }).sort('_id.day', -1)
+
+        return [{
+            'day': row['_id']['day'].date().isoformat(),
+            'event_type': row['_id']['event_type'],
+            'count': row['count']
+        } for row in rows]
 
 # Singleton instance
 audit_service = AuditService()
@@ -7,8 +7,49 @@ Manages vendor bid submission, evaluation, and awarding
 from typing import Dict, List, Any, Optional
 from bson import ObjectId
 from datetime import datetime
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from config.database import db
 from models.bid import BidModel
+from utils.db_helpers import supports_transactions
+
+
+# Documents per getMore when formatting bid listings straight off the cursor
+BID_CURSOR_BATCH_SIZE = 200
+
+# (key, default, transform) for each top-level field of a formatted bid
+BID_RESPONSE_FIELDS = (
+    ('_id', None, str),
+    ('procurement_id', None, str),
+    ('vendor_id', None, str),
+    ('vendor_name', None, None),
+    ('vendor_email', None, None),
+    ('procurement_title', None, None),
+    ('procurement_ref', None, None),
+    ('bid_amount', None, None),
+    ('currency', 'KES', None),
+    ('bid_validity_days', 90, None),
+    ('delivery_timeline', None, None),
+    ('remarks', None, None),
+    ('status', None, None),
+    ('disqualification_reason', None, None),
+    ('total_score', None, None),
+    ('rank', None, None),
+    ('submitted_at', None, datetime.isoformat),
+    ('evaluated_at', None, datetime.isoformat),
+    ('awarded_at', None, datetime.isoformat),
+    ('awarded_amount', None, None),
+    ('award_notes', None, None),
+    ('created_at', None, datetime.isoformat),
+    ('updated_at', None, datetime.isoformat),
+)
+
+# Uploaded documents on a bid and the fields returned besides file_id
+BID_ATTACHMENT_FIELDS = (
+    ('technical_proposal', ('file_name', 'score', 'comments')),
+    ('financial_proposal', ('file_name', 'score', 'comments')),
+    ('bid_bond', ('file_name', 'amount')),
+)
 
 
 class BidService:
@@ -40,8 +81,39 @@ class BidService:
         Raises:
             ValueError: If validation fails
         """
+        proc_obj_id = ObjectId(procurement_id)
+        vendor_obj_id = ObjectId(vendor_id)
+        now = datetime.utcnow()
+
+        # Load the procurement, check the vendor and look for an earlier bid
+        # in one round trip
+        procurement = next(self.procurements.aggregate([
+            {'$match': {'_id': proc_obj_id}},
+            {'$project': {'status': 1, 'submission_deadline': 1}},
+            {
+                '$lookup': {
+                    'from': 'vendors',
+                    'pipeline': [
+                        {'$match': {'_id': vendor_obj_id}},
+                        {'$project': {'_id': 1}}
+                    ],
+                    'as': 'vendor'
+                }
+            },
+            {
+                '$lookup': {
+                    'from': 'bids',
+                    'pipeline': [
+                        {'$match': {'procurement_id': proc_obj_id, 'vendor_id': vendor_obj_id}},
+                        {'$project': {'_id': 1}},
+                        {'$limit': 1}
+                    ],
+                    'as': 'existing_bid'
+                }
+            }
+        ]), None)
+
         # Validate procurement exists and is open for bidding
-        procurement = self.procurements.find_one({'_id': ObjectId(procurement_id)})
         if not procurement:
             raise ValueError('Procurement not found')
 
@@ -50,20 +122,14 @@ class BidService:
 
         # Check if deadline has passed
         if procurement.get('submission_deadline'):
-            if datetime.utcnow() > procurement['submission_deadline']:
+            if now > procurement['submission_deadline']:
                 raise ValueError('Bid submission deadline has passed')
 
         # Validate vendor exists
-        vendor = self.vendors.find_one({'_id': ObjectId(vendor_id)})
-        if not vendor:
+        if not procurement['vendor']:
             raise ValueError('Vendor not found')
 
-        # Check if vendor already submitted a bid
-        existing_bid = self.collection.find_one({
-            'procurement_id': ObjectId(procurement_id),
-            'vendor_id': ObjectId(vendor_id)
-        })
-        if existing_bid:
+        if procurement['existing_bid']:
             raise ValueError('Vendor has already submitted a bid for this procurement')
 
         # Validate bid data
@@ -74,16 +140,20 @@ class BidService:
         # Create bid schema
         bid_schema = BidModel.create_schema(procurement_id, vendor_id, bid_data)
 
-        # Insert bid
-        result = self.collection.insert_one(bid_schema)
+        # Insert bid; the unique (procurement_id, vendor_id) index, when
+        # present, also rejects a concurrent second bid from the same vendor
+        try:
+            result = self.collection.insert_one(bid_schema)
+        except DuplicateKeyError:
+            raise ValueError('Vendor has already submitted a bid for this procurement')
         bid_schema['_id'] = result.inserted_id
 
         # Update procurement bid count
         self.procurements.update_one(
-            {'_id': ObjectId(procurement_id)},
+            {'_id': proc_obj_id},
             {
                 '$inc': {'bid_count': 1},
-                '$set': {'updated_at': datetime.utcnow()}
+                '$set': {'updated_at': now}
             }
         )
 
@@ -109,16 +179,38 @@ class BidService:
         if not include_disqualified:
             query['status'] = {'$ne': 'disqualified'}
 
-        bids = list(self.collection.find(query).sort('submitted_at', 1))
+        # Join vendor name and email server-side and format as the cursor streams
+        pipeline = [
+            {'$match': query},
+            {'$sort': {'submitted_at': 1}},
+            {
+                '$lookup': {
+                    'from': 'vendors',
+                    'localField': 'vendor_id',
+                    'foreignField': '_id',
+                    'pipeline': [{'$project': {'company_name': 1, 'email': 1}}],
+                    'as': 'vendor'
+                }
+            },
+            {'$unwind': {'path': '$vendor', 'preserveNullAndEmptyArrays': True}},
+            {
+                '$addFields': {
+                    'vendor_name': {
+                        '$cond': [
+                            {'$ifNull': ['$vendor', False]},
+                            {'$ifNull': ['$vendor.company_name', 'Unknown']},
+                            None
+                        ]
+                    },
+                    'vendor_email': '$vendor.email'
+                }
+            },
+            {'$project': {'vendor': 0}}
+        ]
 
-        # Populate vendor information
-        for bid in bids:
-            vendor = self.vendors.find_one({'_id': bid['vendor_id']})
-            if vendor:
-                bid['vendor_name'] = vendor.get('company_name', 'Unknown')
-                bid['vendor_email'] = vendor.get('email')
+        cursor = self.collection.aggregate(pipeline, batchSize=BID_CURSOR_BATCH_SIZE)
 
-        return [self._format_bid(bid) for bid in bids]
+        return [self._format_bid(bid) for bid in cursor]
 
     def get_vendor_bids(self, vendor_id: str) -> List[Dict[str, Any]]:
         """
@@ -130,34 +222,74 @@ class BidService:
         Returns:
             List of bid documents with procurement details
         """
-        bids = list(
-            self.collection.find({'vendor_id': ObjectId(vendor_id)})
-            .sort('submitted_at', -1)
-        )
+        # Join procurement title and reference server-side
+        pipeline = [
+            {'$match': {'vendor_id': ObjectId(vendor_id)}},
+            {'$sort': {'submitted_at': -1}},
+            {
+                '$lookup': {
+                    'from': 'procurements',
+                    'localField': 'procurement_id',
+                    'foreignField': '_id',
+                    'pipeline': [{'$project': {'title': 1, 'reference_number': 1}}],
+                    'as': 'procurement'
+                }
+            },
+            {'$unwind': {'path': '$procurement', 'preserveNullAndEmptyArrays': True}},
+            {
+                '$addFields': {
+                    'procurement_title': {
+                        '$cond': [
+                            {'$ifNull': ['$procurement', False]},
+                            {'$ifNull': ['$procurement.title', 'Unknown']},
+                            None
+                        ]
+                    },
+                    'procurement_ref': '$procurement.reference_number'
+                }
+            },
+            {'$project': {'procurement': 0}}
+        ]
 
-        # Populate procurement information
-        for bid in bids:
-            procurement = self.procurements.find_one({'_id': bid['procurement_id']})
-            if procurement:
-                bid['procurement_title'] = procurement.get('title', 'Unknown')
-                bid['procurement_ref'] = procurement.get('reference_number')
+        cursor = self.collection.aggregate(pipeline, batchSize=BID_CURSOR_BATCH_SIZE)
 
-        return [self._format_bid(bid) for bid in bids]
+        return [self._format_bid(bid) for bid in cursor]
 
     def get_bid_by_id(self, bid_id: str) -> Optional[Dict[str, Any]]:
         """Get a single bid by ID"""
-        bid = self.collection.find_one({'_id': ObjectId(bid_id)})
+        # Bid, vendor name and procurement title in one round trip
+        bid = next(self.collection.aggregate([
+            {'$match': {'_id': ObjectId(bid_id)}},
+            {
+                '$lookup': {
+                    'from': 'vendors',
+                    'localField': 'vendor_id',
+                    'foreignField': '_id',
+                    'pipeline': [{'$project': {'company_name': 1}}],
+                    'as': 'vendor'
+                }
+            },
+            {
+                '$lookup': {
+                    'from': 'procurements',
+                    'localField': 'procurement_id',
+                    'foreignField': '_id',
+                    'pipeline': [{'$project': {'title': 1}}],
+                    'as': 'procurement'
+                }
+            }
+        ]), None)
         if not bid:
             return None
 
         # Populate related data
-        vendor = self.vendors.find_one({'_id': bid['vendor_id']})
+        vendor = bid.pop('vendor')
         if vendor:
-            bid['vendor_name'] = vendor.get('company_name', 'Unknown')
+            bid['vendor_name'] = vendor[0].get('company_name', 'Unknown')
 
-        procurement = self.procurements.find_one({'_id': bid['procurement_id']})
+        procurement = bid.pop('procurement')
         if procurement:
-            bid['procurement_title'] = procurement.get('title', 'Unknown')
+            bid['procurement_title'] = procurement[0].get('title', 'Unknown')
 
         return self._format_bid(bid)
 
@@ -181,8 +313,11 @@ class BidService:
         Raises:
             ValueError: If validation fails
         """
+        bid_obj_id = ObjectId(bid_id)
+        evaluator_obj_id = ObjectId(evaluator_id)
+
         # Validate bid exists
-        bid = self.collection.find_one({'_id': ObjectId(bid_id)})
+        bid = self.collection.find_one({'_id': bid_obj_id}, {'status': 1})
         if not bid:
             raise ValueError('Bid not found')
 
@@ -190,7 +325,7 @@ class BidService:
             raise ValueError('Bid cannot be evaluated in current status')
 
         # Validate evaluator exists
-        evaluator = self.users.find_one({'_id': ObjectId(evaluator_id)})
+        evaluator = self.users.find_one({'_id': evaluator_obj_id}, {'full_name': 1})
         if not evaluator:
             raise ValueError('Evaluator not found')
 
@@ -199,33 +334,21 @@ class BidService:
         if not is_valid:
             raise ValueError(error)
 
-        # Check if evaluator already evaluated this bid
-        existing_evaluation = next(
-            (e for e in bid.get('evaluations', [])
-             if str(e['evaluator_id']) == evaluator_id),
-            None
-        )
-
-        if existing_evaluation:
-            raise ValueError('Evaluator has already evaluated this bid')
-
         # Create evaluation schema
         evaluation_data['evaluator_name'] = evaluator.get('full_name', 'Unknown')
         evaluation_schema = BidModel.evaluation_schema(evaluator_id, evaluation_data)
 
-        # Update bid with evaluation
+        # Append the evaluation and keep total_score current server-side;
+        # the filter skips bids this evaluator has already scored
         result = self.collection.find_one_and_update(
-            {'_id': ObjectId(bid_id)},
-            {
-                '$push': {'evaluations': evaluation_schema},
-                '$set': {
-                    'status': 'under_evaluation',
-                    'updated_at': datetime.utcnow()
-                }
-            },
+            {'_id': bid_obj_id, 'evaluations.evaluator_id': {'$ne': evaluator_obj_id}},
+            BidModel.evaluation_update(evaluation_schema, datetime.utcnow()),
             return_document=True
         )
 
+        if not result:
+            raise ValueError('Evaluator has already evaluated this bid')
+
         return self._format_bid(result)
 
     def calculate_final_scores(self, procurement_id: str) -> List[Dict[str, Any]]:
@@ -238,56 +361,49 @@ class BidService:
         Returns:
             List of bids with calculated scores and rankings
         """
-        # Get all bids with evaluations
-        bids = list(
-            self.collection.find({
-                'procurement_id': ObjectId(procurement_id),
-                'status': {'$in': ['submitted', 'under_evaluation']}
-            })
-        )
-
-        bid_scores = []
-
-        for bid in bids:
-            evaluations = bid.get('evaluations', [])
-
-            if not evaluations:
-                continue
+        query = {
+            'procurement_id': ObjectId(procurement_id),
+            'status': {'$in': ['submitted', 'under_evaluation']},
+            'evaluations.0': {'$exists': True}
+        }
 
-            # Calculate average scores
-            avg_technical = sum(e['technical_score'] for e in evaluations) / len(evaluations)
-            avg_financial = sum(e['financial_score'] for e in evaluations) / len(evaluations)
-            total_score = avg_technical + avg_financial
+        # Bids evaluated before evaluate_bid kept running sums have no
+        # total_score; compute it from their evaluations so they rank correctly
+        self.collection.update_many(
+            {**query, 'total_score': None},
+            BidModel.running_scores_backfill()
+        )
 
-            bid_scores.append({
-                'bid_id': bid['_id'],
-                'total_score': total_score,
-                'avg_technical': avg_technical,
-                'avg_financial': avg_financial
-            })
+        # total_score is maintained by evaluate_bid, so ranking is a sort
+        bid_scores = list(
+            self.collection
+            .find(query, {'_id': 1})
+            .sort([('total_score', -1), ('_id', 1)])
+        )
 
-        # Sort by total score (descending)
-        bid_scores.sort(key=lambda x: x['total_score'], reverse=True)
+        if not bid_scores:
+            return []
 
-        # Update bids with scores and rankings
-        updated_bids = []
-        for rank, score_data in enumerate(bid_scores, start=1):
-            result = self.collection.find_one_and_update(
-                {'_id': score_data['bid_id']},
+        # Update bids with rankings in one batch
+        now = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne(
+                {'_id': score_data['_id']},
                 {
                     '$set': {
-                        'total_score': score_data['total_score'],
                         'rank': rank,
                         'status': 'qualified',
-                        'evaluated_at': datetime.utcnow(),
-                        'updated_at': datetime.utcnow()
+                        'evaluated_at': now,
+                        'updated_at': now
                     }
-                },
-                return_document=True
+                }
             )
-            updated_bids.append(self._format_bid(result))
+            for rank, score_data in enumerate(bid_scores, start=1)
+        ], ordered=False)
 
-        return updated_bids
+        updated_bids = self.collection.find({'_id': {'$in': [s['_id'] for s in bid_scores]}}).sort('rank', 1)
+
+        return [self._format_bid(bid) for bid in updated_bids]
 
     def award_bid(
         self,
@@ -307,57 +423,76 @@ class BidService:
         Raises:
             ValueError: If bid cannot be awarded
         """
+        bid_obj_id = ObjectId(bid_id)
+        now = datetime.utcnow()
+
         # Validate bid exists
-        bid = self.collection.find_one({'_id': ObjectId(bid_id)})
+        bid = self.collection.find_one(
+            {'_id': bid_obj_id},
+            {'status': 1, 'bid_amount': 1, 'procurement_id': 1, 'vendor_id': 1}
+        )
         if not bid:
             raise ValueError('Bid not found')
 
         if bid['status'] != 'qualified':
             raise ValueError('Only qualified bids can be awarded')
 
-        # Update bid status
-        result = self.collection.find_one_and_update(
-            {'_id': ObjectId(bid_id)},
-            {
-                '$set': {
-                    'status': 'awarded',
-                    'awarded_at': datetime.utcnow(),
-                    'awarded_amount': award_data.get('awarded_amount', bid['bid_amount']),
-                    'award_notes': award_data.get('notes'),
-                    'updated_at': datetime.utcnow()
-                }
-            },
-            return_document=True
-        )
+        awarded_amount = award_data.get('awarded_amount', bid['bid_amount'])
+
+        def apply_award(session=None):
+            # Award this bid and reject the others in one batch
+            self.collection.bulk_write([
+                UpdateOne(
+                    {'_id': bid_obj_id},
+                    {
+                        '$set': {
+                            'status': 'awarded',
+                            'awarded_at': now,
+                            'awarded_amount': awarded_amount,
+                            'award_notes': award_data.get('notes'),
+                            'updated_at': now
+                        }
+                    }
+                ),
+                UpdateMany(
+                    {
+                        'procurement_id': bid['procurement_id'],
+                        '_id': {'$ne': bid_obj_id},
+                        'status': {'$in': ['submitted', 'under_evaluation', 'qualified']}
+                    },
+                    {
+                        '$set': {
+                            'status': 'rejected',
+                            'updated_at': now
+                        }
+                    }
+                )
+            ], ordered=False, session=session)
 
-        # Update procurement status
-        self.procurements.update_one(
-            {'_id': bid['procurement_id']},
-            {
-                '$set': {
-                    'status': 'awarded',
-                    'awarded_vendor_id': bid['vendor_id'],
-                    'awarded_amount': award_data.get('awarded_amount', bid['bid_amount']),
-                    'awarded_at': datetime.utcnow(),
-                    'updated_at': datetime.utcnow()
-                }
-            }
-        )
+            # Update procurement status
+            self.procurements.update_one(
+                {'_id': bid['procurement_id']},
+                {
+                    '$set': {
+                        'status': 'awarded',
+                        'awarded_vendor_id': bid['vendor_id'],
+                        'awarded_amount': awarded_amount,
+                        'awarded_at': now,
+                        'updated_at': now
+                    }
+                },
+                session=session
+            )
 
-        # Mark other bids as rejected
-        self.collection.update_many(
-            {
-                'procurement_id': bid['procurement_id'],
-                '_id': {'$ne': ObjectId(bid_id)},
-                'status': {'$in': ['submitted', 'under_evaluation', 'qualified']}
-            },
-            {
-                '$set': {
-                    'status': 'rejected',
-                    'updated_at': datetime.utcnow()
-                }
-            }
-        )
+        # The bids and the procurement change together where transactions
+        # are available (replica set or sharded cluster)
+        if supports_transactions(db.client):
+            with db.client.start_session() as session:
+                session.with_transaction(apply_award)
+        else:
+            apply_award()
+
+        result = self.collection.find_one({'_id': bid_obj_id})
 
         return self._format_bid(result)
 
@@ -449,55 +584,19 @@ class BidService:
         if not bid:
             return None
 
-        formatted = {
-            '_id': str(bid['_id']),
-            'procurement_id': str(bid['procurement_id']),
-            'vendor_id': str(bid['vendor_id']),
-            'vendor_name': bid.get('vendor_name'),
-            'vendor_email': bid.get('vendor_email'),
-            'procurement_title': bid.get('procurement_title'),
-            'procurement_ref': bid.get('procurement_ref'),
-            'bid_amount': bid['bid_amount'],
-            'currency': bid.get('currency', 'KES'),
-            'bid_validity_days': bid.get('bid_validity_days', 90),
-            'delivery_timeline': bid.get('delivery_timeline'),
-            'remarks': bid.get('remarks'),
-            'status': bid['status'],
-            'disqualification_reason': bid.get('disqualification_reason'),
-            'total_score': bid.get('total_score'),
-            'rank': bid.get('rank'),
-            'submitted_at': bid['submitted_at'].isoformat(),
-            'evaluated_at': bid['evaluated_at'].isoformat() if bid.get('evaluated_at') else None,
-            'awarded_at': bid['awarded_at'].isoformat() if bid.get('awarded_at') else None,
-            'awarded_amount': bid.get('awarded_amount'),
-            'award_notes': bid.get('award_notes'),
-            'created_at': bid['created_at'].isoformat(),
-            'updated_at': bid['updated_at'].isoformat(),
-        }
+        formatted = {}
+        for key, default, transform in BID_RESPONSE_FIELDS:
+            value = bid.get(key, default)
+            formatted[key] = transform(value) if transform and value is not None else value
 
         # Add proposal information
-        if bid.get('technical_proposal'):
-            formatted['technical_proposal'] = {
-                'file_id': str(bid['technical_proposal']['file_id']) if bid['technical_proposal'].get('file_id') else None,
-                'file_name': bid['technical_proposal'].get('file_name'),
-                'score': bid['technical_proposal'].get('score'),
-                'comments': bid['technical_proposal'].get('comments'),
-            }
-
-        if bid.get('financial_proposal'):
-            formatted['financial_proposal'] = {
-                'file_id': str(bid['financial_proposal']['file_id']) if bid['financial_proposal'].get('file_id') else None,
-                'file_name': bid['financial_proposal'].get('file_name'),
-                'score': bid['financial_proposal'].get('score'),
-                'comments': bid['financial_proposal'].get('comments'),
-            }
-
-        if bid.get('bid_bond'):
-            formatted['bid_bond'] = {
-                'file_id': str(bid['bid_bond']['file_id']) if bid['bid_bond'].get('file_id') else None,
-                'file_name': bid['bid_bond'].get('file_name'),
-                'amount': bid['bid_bond'].get('amount'),
-            }
+        for key, fields in BID_ATTACHMENT_FIELDS:
+            attachment = bid.get(key)
+            if attachment:
+                formatted[key] = {
+                    'file_id': str(attachment['file_id']) if attachment.get('file_id') else None,
+                    **{field: attachment.get(field) for field in fields}
+                }
 
         # Add evaluations
         if bid.get('evaluations'):
@@ -1,16 +1,106 @@
 """Challenge Service - manages coding challenges for skill assessments"""
-from typing import Dict, List, Optional
+import hashlib
+import json
+import logging
+import random
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Union
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from config.database import db
 from models.challenge import ChallengeModel
+from utils.db_helpers import supports_transactions
 from utils.helpers import get_object_id, serialize_doc
 
+logger = logging.getLogger(__name__)
+
 
 class ChallengeService:
     """Service for managing coding challenges"""
 
+    SEED_META_KEY = 'challenges'
+
     def __init__(self):
         self.collection = db.challenges
+        self.seed_meta = db.seed_meta
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group challenge writes into a single MongoDB transaction
+
+        Yields a client session to pass to write methods. Standalone servers
+        cannot run transactions, so there it yields None and writes commit
+        individually.
+        """
+        if not supports_transactions(db.client):
+            yield None
+            return
+
+        with db.client.start_session() as session:
+            with session.start_transaction():
+                yield session
+
+    def get_seed_hash(self) -> Optional[str]:
+        """
+        Get the content hash of the last successful challenge seed
+
+        Returns:
+            Stored hash or None if never seeded
+        """
+        meta = self.seed_meta.find_one({'_id': self.SEED_META_KEY}, {'hash': 1})
+        return meta.get('hash') if meta else None
+
+    def set_seed_hash(self, digest: str) -> None:
+        """
+        Record the content hash of a successful challenge seed
+
+        Args:
+            digest: SHA-256 of the seeded challenge data
+        """
+        from datetime import datetime
+
+        self.seed_meta.update_one(
+            {'_id': self.SEED_META_KEY},
+            {'$set': {'hash': digest, 'updated_at': datetime.utcnow()}},
+            upsert=True
+        )
+
+    def merge_staged_challenges(self, staging_name: str) -> None:
+        """
+        Upsert challenges loaded into a staging collection, keyed on title
+
+        Matches the bulk_create_challenges upsert: content fields are
+        replaced, while metadata, created_at and rand are kept for existing
+        titles and stamped at merge time for new ones. Requires MongoDB 4.4.2+
+        for $rand.
+
+        Args:
+            staging_name: Collection holding the imported challenge schemas;
+                dropped once the merge has run
+        """
+        try:
+            db[staging_name].aggregate([
+                {'$unset': '_id'},
+                {'$set': {'created_at': '$$NOW', 'updated_at': '$$NOW', 'rand': {'$rand': {}}}},
+                {'$merge': {
+                    'into': self.collection.name,
+                    'on': 'title',
+                    'whenMatched': [{'$replaceWith': {'$mergeObjects': [
+                        '$$new',
+                        {
+                            '_id': '$_id',
+                            'metadata': '$metadata',
+                            'created_at': '$created_at',
+                            'rand': '$rand'
+                        }
+                    ]}}],
+                    'whenNotMatched': 'insert'
+                }}
+            ])
+        finally:
+            db.drop_collection(staging_name)
 
     def create_challenge(self, data: Dict) -> Optional[str]:
         """
@@ -21,15 +111,18 @@ class ChallengeService:
 
         Returns:
             Challenge ID if successful, None otherwise
+
+        Raises:
+            ValueError: If a challenge with the same title already exists
         """
         try:
             # Validate inputs
             if not ChallengeModel.validate_skill(data.get('skill', '')):
-                print(f"Invalid skill: {data.get('skill')}")
+                logger.warning("Invalid skill: %s", data.get('skill'))
                 return None
 
             if not ChallengeModel.validate_difficulty(data.get('difficulty_level', '')):
-                print(f"Invalid difficulty: {data.get('difficulty_level')}")
+                logger.warning("Invalid difficulty: %s", data.get('difficulty_level'))
                 return None
 
             # Create challenge schema
@@ -40,10 +133,131 @@ class ChallengeService:
 
             return str(result.inserted_id)
 
-        except Exception as e:
-            print(f"Error creating challenge: {e}")
+        except DuplicateKeyError:
+            raise ValueError(f"A challenge titled '{data.get('title')}' already exists")
+        except Exception:
+            logger.exception("Error creating challenge")
             return None
 
+    @staticmethod
+    def to_columns(rows: List[Dict]) -> Dict[str, List]:
+        """
+        Convert row-oriented challenge data into a column-oriented mapping
+
+        Args:
+            rows: List of challenge data with identical keys
+
+        Returns:
+            Dict of field name -> list of values
+        """
+        if not rows:
+            return {}
+
+        keys = list(rows[0].keys())
+        return {key: [row[key] for row in rows] for key in keys}
+
+    @staticmethod
+    def content_hash(data: Dict) -> str:
+        """SHA-256 over a challenge's content, used to skip unchanged upserts"""
+        payload = json.dumps(dict(data), sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def bulk_create_challenges(
+        self,
+        challenges: Union[List[Dict], Dict[str, List]],
+        session=None
+    ) -> List[Optional[str]]:
+        """
+        Upsert many coding challenges keyed on title
+
+        Existing titles are read in one query; only new or changed challenges
+        (by content hash) are written, in a single unordered bulk_write.
+
+        Args:
+            challenges: List of challenge data, or columns from to_columns()
+            session: Optional client session from transaction()
+
+        Returns:
+            List of challenge IDs aligned with the input (None where invalid)
+
+        Raises:
+            PyMongoError: If the read or bulk write fails
+        """
+        if isinstance(challenges, dict):
+            # Columnar input: rebuild rows in one zip pass
+            keys = list(challenges.keys())
+            challenges = [dict(zip(keys, values)) for values in zip(*challenges.values())]
+
+        ids: List[Optional[str]] = [None] * len(challenges)
+        valid = []
+
+        for index, data in enumerate(challenges):
+            if not ChallengeModel.validate_skill(data.get('skill', '')):
+                logger.warning("Invalid skill: %s", data.get('skill'))
+                continue
+
+            if not ChallengeModel.validate_difficulty(data.get('difficulty_level', '')):
+                logger.warning("Invalid difficulty: %s", data.get('difficulty_level'))
+                continue
+
+            valid.append(index)
+
+        if not valid:
+            return ids
+
+        # Later rows win when a title repeats, as sequential upserts would;
+        # two upserts for one title in an unordered bulk_write would race
+        latest = {challenges[index].get('title', ''): index for index in valid}
+        titles = list(latest.keys())
+        existing = {
+            doc['title']: doc
+            for doc in self.collection.find(
+                {'title': {'$in': titles}},
+                {'title': 1, 'content_hash': 1},
+                session=session
+            )
+        }
+
+        operations = []
+        positions = []
+
+        for index in latest.values():
+            data = challenges[index]
+            digest = self.content_hash(data)
+            current = existing.get(data.get('title', ''))
+
+            if current and current.get('content_hash') == digest:
+                ids[index] = str(current['_id'])
+                continue
+
+            schema = ChallengeModel.create_schema(data)
+            on_insert = {
+                'metadata': schema.pop('metadata'),
+                'created_at': schema.pop('created_at')
+            }
+            schema['content_hash'] = digest
+
+            operations.append(UpdateOne(
+                {'title': schema['title']},
+                {'$set': schema, '$setOnInsert': on_insert},
+                upsert=True
+            ))
+            positions.append(index)
+
+            if current:
+                ids[index] = str(current['_id'])
+
+        if operations:
+            result = self.collection.bulk_write(operations, ordered=False, session=session)
+
+            for op_index, upserted_id in result.upserted_ids.items():
+                ids[positions[op_index]] = str(upserted_id)
+
+        for index in valid:
+            ids[index] = ids[latest[challenges[index].get('title', '')]]
+
+        return ids
+
     def get_challenge_by_id(self, challenge_id: str) -> Optional[Dict]:
         """
         Get challenge by ID
@@ -57,8 +271,8 @@ class ChallengeService:
         try:
             challenge = self.collection.find_one({'_id': get_object_id(challenge_id)})
             return serialize_doc(challenge) if challenge else None
-        except Exception as e:
-            print(f"Error fetching challenge: {e}")
+        except Exception:
+            logger.exception("Error fetching challenge")
             return None
 
     def get_challenges(
@@ -68,7 +282,8 @@ class ChallengeService:
         challenge_type: Optional[str] = None,
         is_active: bool = True,
         page: int = 1,
-        per_page: int = 20
+        per_page: int = 20,
+        include_total: bool = True
     ) -> Dict:
         """
         Get challenges with filtering and pagination
@@ -80,6 +295,7 @@ class ChallengeService:
             is_active: Filter by active status
             page: Page number
             per_page: Items per page
+            include_total: Count matches past page 1 (page 1 always counts)
 
         Returns:
             Dict with challenges and pagination info
@@ -95,30 +311,55 @@ class ChallengeService:
             if challenge_type:
                 query['challenge_type'] = challenge_type
 
-            # Count total
-            total = self.collection.count_documents(query)
+            cursor = self.collection.find(query).sort('created_at', -1)
+            return self._paginate(cursor, query, page, per_page, include_total=include_total)
 
-            # Get paginated results
-            skip = (page - 1) * per_page
-            challenges = list(
-                self.collection
-                .find(query)
-                .sort('created_at', -1)
-                .skip(skip)
-                .limit(per_page)
-            )
+        except Exception:
+            logger.exception("Error fetching challenges")
+            return {'total': 0, 'challenges': []}
 
-            return {
-                'total': total,
-                'page': page,
-                'per_page': per_page,
-                'total_pages': (total + per_page - 1) // per_page,
-                'challenges': [serialize_doc(c) for c in challenges]
-            }
+    def _paginate(
+        self,
+        cursor,
+        query: Dict,
+        page: int,
+        per_page: int,
+        include_total: bool = True
+    ) -> Dict:
+        """
+        Read one page from a sorted cursor
 
-        except Exception as e:
-            print(f"Error fetching challenges: {e}")
-            return {'total': 0, 'challenges': []}
+        One extra document is fetched to tell whether another page exists.
+        Page 1 always runs an exact count; clients that page with has_more
+        can pass include_total=False to skip the count on later pages, in
+        which case total and total_pages are None.
+
+        Args:
+            cursor: Sorted find cursor for the query
+            query: Query used for the count
+            page: Page number
+            per_page: Items per page
+            include_total: Count matches on pages after the first
+
+        Returns:
+            Dict with challenges and pagination info
+        """
+        skip = (page - 1) * per_page
+        challenges = list(cursor.skip(skip).limit(per_page + 1))
+
+        has_more = len(challenges) > per_page
+        challenges = challenges[:per_page]
+
+        total = self.collection.count_documents(query) if include_total or page == 1 else None
+
+        return {
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total + per_page - 1) // per_page if total is not None else None,
+            'has_more': has_more,
+            'challenges': [serialize_doc(c) for c in challenges]
+        }
 
     def get_random_challenge(self, skill: str, difficulty_level: str) -> Optional[Dict]:
         """
@@ -132,28 +373,33 @@ class ChallengeService:
             Random challenge or None
         """
         try:
-            # Use MongoDB aggregation to get random
-            pipeline = [
-                {
-                    '$match': {
-                        'skill': skill,
-                        'difficulty_level': difficulty_level,
-                        'is_active': True,
-                        'is_public': True
-                    }
-                },
-                {'$sample': {'size': 1}}
-            ]
+            query = {
+                'skill': skill,
+                'difficulty_level': difficulty_level,
+                'is_active': True,
+                'is_public': True
+            }
+
+            # Seek to a random point on the rand index, wrapping around once
+            pivot = random.random()
+            challenge = (
+                self.collection.find_one({**query, 'rand': {'$gte': pivot}}, sort=[('rand', 1)])
+                or self.collection.find_one({**query, 'rand': {'$lt': pivot}}, sort=[('rand', 1)])
+            )
+
+            if challenge:
+                return serialize_doc(challenge)
 
-            result = list(self.collection.aggregate(pipeline))
+            # Challenges created before rand was added
+            result = list(self.collection.aggregate([{'$match': query}, {'$sample': {'size': 1}}]))
 
             if result:
                 return serialize_doc(result[0])
 
             return None
 
-        except Exception as e:
-            print(f"Error getting random challenge: {e}")
+        except Exception:
+            logger.exception("Error getting random challenge")
             return None
 
     def update_challenge(self, challenge_id: str, data: Dict) -> bool:
@@ -186,8 +432,8 @@ class ChallengeService:
 
             return result.modified_count > 0
 
-        except Exception as e:
-            print(f"Error updating challenge: {e}")
+        except Exception:
+            logger.exception("Error updating challenge")
             return False
 
     def delete_challenge(self, challenge_id: str) -> bool:
@@ -215,8 +461,8 @@ class ChallengeService:
 
             return result.modified_count > 0
 
-        except Exception as e:
-            print(f"Error deleting challenge: {e}")
+        except Exception:
+            logger.exception("Error deleting challenge")
             return False
 
     def update_challenge_stats(self, challenge_id: str, score: int, completion_time_minutes: int) -> bool:
@@ -232,34 +478,16 @@ class ChallengeService:
             True if successful
         """
         try:
-            challenge = self.get_challenge_by_id(challenge_id)
-            if not challenge:
-                return False
-
-            # Calculate new stats
-            new_stats = ChallengeModel.update_usage_stats(
-                challenge,
-                score,
-                completion_time_minutes
-            )
-
-            # Update in database
+            # Stats are recomputed server-side in a single pipeline update
             result = self.collection.update_one(
                 {'_id': get_object_id(challenge_id)},
-                {
-                    '$set': {
-                        'metadata.times_used': new_stats['times_used'],
-                        'metadata.average_score': new_stats['average_score'],
-                        'metadata.average_completion_time': new_stats['average_completion_time'],
-                        'metadata.pass_rate': new_stats['pass_rate']
-                    }
-                }
+                ChallengeModel.usage_stats_update(score, completion_time_minutes)
             )
 
             return result.modified_count > 0
 
-        except Exception as e:
-            print(f"Error updating challenge stats: {e}")
+        except Exception:
+            logger.exception("Error updating challenge stats")
             return False
 
     def get_public_challenge(self, challenge_id: str, include_answers: bool = False) -> Optional[Dict]:
@@ -280,11 +508,17 @@ class ChallengeService:
 
             return ChallengeModel.create_public_view(challenge, include_answers)
 
-        except Exception as e:
-            print(f"Error getting public challenge: {e}")
+        except Exception:
+            logger.exception("Error getting public challenge")
             return None
 
-    def search_challenges(self, search_term: str, page: int = 1, per_page: int = 20) -> Dict:
+    def search_challenges(
+        self,
+        search_term: str,
+        page: int = 1,
+        per_page: int = 20,
+        include_total: bool = True
+    ) -> Dict:
         """
         Search challenges by title or description
 
@@ -292,43 +526,30 @@ class ChallengeService:
             search_term: Search query
             page: Page number
             per_page: Items per page
+            include_total: Count matches past page 1 (page 1 always counts)
 
         Returns:
             Dict with challenges and pagination
         """
         try:
-            # Build text search query
+            # Build text search query (served by the text_search index)
             query = {
                 'is_active': True,
                 'is_public': True,
-                '$or': [
-                    {'title': {'$regex': search_term, '$options': 'i'}},
-                    {'description': {'$regex': search_term, '$options': 'i'}},
-                    {'skill': {'$regex': search_term, '$options': 'i'}}
-                ]
+                '$text': {'$search': search_term}
             }
 
-            total = self.collection.count_documents(query)
-
-            skip = (page - 1) * per_page
-            challenges = list(
+            # Most relevant first, then most used
+            cursor = (
                 self.collection
-                .find(query)
-                .sort('metadata.times_used', -1)
-                .skip(skip)
-                .limit(per_page)
+                .find(query, {'score': {'$meta': 'textScore'}})
+                .sort([('score', {'$meta': 'textScore'}), ('metadata.times_used', -1)])
             )
 
-            return {
-                'total': total,
-                'page': page,
-                'per_page': per_page,
-                'total_pages': (total + per_page - 1) // per_page,
-                'challenges': [serialize_doc(c) for c in challenges]
-            }
+            return self._paginate(cursor, query, page, per_page, include_total=include_total)
 
-        except Exception as e:
-            print(f"Error searching challenges: {e}")
+        except Exception:
+            logger.exception("Error searching challenges")
             return {'total': 0, 'challenges': []}
 
     def get_challenge_stats(self) -> Dict:
@@ -339,29 +560,23 @@ class ChallengeService:
             Statistics dict
         """
         try:
-            total_challenges = self.collection.count_documents({'is_active': True})
-
-            # Count by skill
-            pipeline = [
+            # Counts and the most popular challenges in one round trip
+            facets = next(self.collection.aggregate([
                 {'$match': {'is_active': True}},
-                {'$group': {'_id': '$skill', 'count': {'$sum': 1}}}
-            ]
-            by_skill = {item['_id']: item['count'] for item in self.collection.aggregate(pipeline)}
-
-            # Count by difficulty
-            pipeline = [
-                {'$match': {'is_active': True}},
-                {'$group': {'_id': '$difficulty_level', 'count': {'$sum': 1}}}
-            ]
-            by_difficulty = {item['_id']: item['count'] for item in self.collection.aggregate(pipeline)}
+                {
+                    '$facet': {
+                        'total': [{'$count': 'n'}],
+                        'by_skill': [{'$group': {'_id': '$skill', 'count': {'$sum': 1}}}],
+                        'by_difficulty': [{'$group': {'_id': '$difficulty_level', 'count': {'$sum': 1}}}],
+                        'popular': [{'$sort': {'metadata.times_used': -1}}, {'$limit': 5}]
+                    }
+                }
+            ]))
 
-            # Most popular challenges
-            popular = list(
-                self.collection
-                .find({'is_active': True})
-                .sort('metadata.times_used', -1)
-                .limit(5)
-            )
+            total_challenges = facets['total'][0]['n'] if facets['total'] else 0
+            by_skill = {item['_id']: item['count'] for item in facets['by_skill']}
+            by_difficulty = {item['_id']: item['count'] for item in facets['by_difficulty']}
+            popular = facets['popular']
 
             return {
                 'total_challenges': total_challenges,
@@ -370,8 +585,8 @@ class ChallengeService:
                 'most_popular': [serialize_doc(c) for c in popular]
             }
 
-        except Exception as e:
-            print(f"Error getting challenge stats: {e}")
+        except Exception:
+            logger.exception("Error getting challenge stats")
             return {}
 
 
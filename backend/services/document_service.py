@@ -1,36 +1,50 @@
 """Document service for GridFS file management"""
+from functools import partial
 from typing import Dict, Optional, BinaryIO
 from bson import ObjectId
 from datetime import datetime
+from gridfs import GridOut
 from config.database import db, gridfs
+from config.settings import get_config
 from werkzeug.utils import secure_filename
 from utils.db_helpers import serialize_document, get_object_id
 
 
+# Bytes read from the upload stream per GridFS write
+COPY_BUFFER_SIZE = 256 * 1024
+
+
 class DocumentService:
     """Service for managing documents using GridFS"""
 
     def __init__(self):
         self.fs = gridfs
         self.files_collection = db['documents.files']
+        # Larger chunks mean fewer chunk documents to write per upload
+        self.chunk_size = get_config().GRIDFS_CHUNK_SIZE
 
     def upload_document(
         self,
-        file_data: bytes,
+        file_stream: BinaryIO,
         filename: str,
         content_type: str,
         procurement_id: str = None,
-        uploaded_by: str = None
+        uploaded_by: str = None,
+        chunk_size_bytes: Optional[int] = None
     ) -> str:
         """
         Upload document to GridFS
 
+        The stream is copied in COPY_BUFFER_SIZE pieces, so the whole file
+        is never held in memory.
+
         Args:
-            file_data: File binary data
+            file_stream: Readable binary stream positioned at the file start
             filename: Original filename
             content_type: MIME type
             procurement_id: Optional procurement reference
             uploaded_by: Optional user ID
+            chunk_size_bytes: GridFS chunk size (defaults to GRIDFS_CHUNK_SIZE)
 
         Returns:
             GridFS file ID
@@ -42,7 +56,6 @@ class DocumentService:
         metadata = {
             'original_filename': filename,
             'content_type': content_type,
-            'file_size': len(file_data),
             'uploaded_at': datetime.utcnow(),
             'gemini_analysis': {
                 'processed': False,
@@ -62,14 +75,20 @@ class DocumentService:
                 metadata['uploaded_by'] = user_obj_id
 
         # Store in GridFS
-        file_id = self.fs.put(
-            file_data,
+        file_size = 0
+        with self.fs.new_file(
             filename=safe_filename,
             content_type=content_type,
-            metadata=metadata
-        )
+            chunkSize=chunk_size_bytes or self.chunk_size
+        ) as grid_in:
+            for chunk in iter(partial(file_stream.read, COPY_BUFFER_SIZE), b''):
+                grid_in.write(chunk)
+                file_size += len(chunk)
 
-        return str(file_id)
+            # Saved with the files document when grid_in closes
+            grid_in.metadata = {**metadata, 'file_size': file_size}
+
+        return str(grid_in._id)
 
     def get_document(self, file_id: str) -> Optional[Dict]:
         """
@@ -104,15 +123,15 @@ class DocumentService:
             print(f"Error retrieving document: {e}")
             return None
 
-    def get_document_data(self, file_id: str) -> Optional[bytes]:
+    def open_document(self, file_id: str) -> Optional[GridOut]:
         """
-        Get document binary data
+        Open document for streaming reads
 
         Args:
             file_id: GridFS file ID
 
         Returns:
-            Binary data or None
+            File-like GridOut that reads chunks on demand, or None
         """
         obj_id = get_object_id(file_id)
 
@@ -120,11 +139,10 @@ class DocumentService:
             return None
 
         try:
-            grid_out = self.fs.get(obj_id)
-            return grid_out.read()
+            return self.fs.get(obj_id)
 
         except Exception as e:
-            print(f"Error retrieving document data: {e}")
+            print(f"Error opening document: {e}")
             return None
 
     def delete_document(self, file_id: str) -> bool:
@@ -206,7 +224,8 @@ class DocumentService:
             if proc_obj_id:
                 query['metadata.procurement_id'] = proc_obj_id
 
-        documents = self.files_collection.find(query).limit(limit)
+        # Newest first, served by the procurement_upload_date_desc index
+        documents = self.files_collection.find(query).sort('uploadDate', -1).limit(limit)
 
         return serialize_document(list(documents))
 
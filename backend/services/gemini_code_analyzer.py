@@ -2,21 +2,20 @@
 import os
 import json
 from typing import Dict, Optional
-import google.generativeai as genai
+from utils.gemini import get_model
 
-# Configure Gemini AI
+# Gemini AI settings; the client itself is configured on first use
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 GEMINI_MODEL = os.getenv('GEMINI_MODEL_QUICK', 'gemini-1.5-flash')
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-
 
 class GeminiCodeAnalyzer:
     """Service for analyzing code submissions using Gemini AI"""
 
-    def __init__(self):
-        self.model = genai.GenerativeModel(GEMINI_MODEL) if GEMINI_API_KEY else None
+    @property
+    def model(self):
+        """Gemini model, configured on first access (None without an API key)"""
+        return get_model(GEMINI_MODEL) if GEMINI_API_KEY else None
 
     def analyze_code_submission(
         self,
@@ -1,18 +1,25 @@
 """Gemini AI integration service for document analysis and anomaly detection"""
-import google.generativeai as genai
 import json
 from typing import Dict, List, Optional, Any
 from config.settings import get_config
+from utils.gemini import get_model
 
 
 class GeminiService:
     """Service for interacting with Gemini AI"""
 
     def __init__(self):
-        config = get_config()
-        genai.configure(api_key=config.GEMINI_API_KEY)
-        self.model_parsing = genai.GenerativeModel(config.GEMINI_MODEL_PARSING)
-        self.model_quick = genai.GenerativeModel(config.GEMINI_MODEL_QUICK)
+        self.config = get_config()
+
+    @property
+    def model_parsing(self):
+        """Document parsing model, configured on first access"""
+        return get_model(self.config.GEMINI_MODEL_PARSING)
+
+    @property
+    def model_quick(self):
+        """Quick analysis model, configured on first access"""
+        return get_model(self.config.GEMINI_MODEL_QUICK)
 
     def parse_procurement_document(self, document_data: bytes, mime_type: str) -> Dict:
         """
@@ -2,6 +2,7 @@
 from typing import Dict, List, Optional
 from bson import ObjectId
 from datetime import datetime
+from pymongo import UpdateOne
 from config.database import db
 from models.procurement import ProcurementModel
 from utils.db_helpers import serialize_document, get_object_id, paginate_query
@@ -24,9 +25,11 @@ class ProcurementService:
         Returns:
             Created procurement ID
         """
-        # Add creator
+        # Add creator, denormalizing their department for analytics
         if created_by:
             data['created_by'] = ObjectId(created_by)
+            creator = db.users.find_one({'_id': data['created_by']}, {'department': 1})
+            data['creator_department'] = creator.get('department') if creator else None
 
         # Create schema
         record = ProcurementModel.create_schema(data)
@@ -222,7 +225,7 @@ class ProcurementService:
 
         return result.modified_count > 0
 
-    def update_ai_metadata(self, procurement_id: str, ai_analysis: Dict, risk_score: float) -> bool:
+    def update_ai_metadata(self, procurement_id: str, ai_analysis: Dict, risk_score: float, session=None) -> bool:
         """
         Update AI analysis metadata for procurement
 
@@ -230,6 +233,7 @@ class ProcurementService:
             procurement_id: Procurement ID
             ai_analysis: AI analysis results
             risk_score: Risk score from analysis
+            session: Optional client session to run the update in
 
         Returns:
             True if updated, False otherwise
@@ -241,19 +245,49 @@ class ProcurementService:
 
         result = self.collection.update_one(
             {'_id': obj_id},
-            {
-                '$set': {
-                    'metadata.ai_analyzed': True,
-                    'metadata.ai_analysis_date': datetime.utcnow(),
-                    'metadata.risk_score': risk_score,
-                    'metadata.has_anomalies': risk_score > 50,
-                    'updated_at': datetime.utcnow()
-                }
-            }
+            {'$set': self._ai_metadata_fields(risk_score)},
+            session=session
         )
 
         return result.modified_count > 0
 
+    def update_ai_metadata_bulk(self, risk_scores: Dict[str, float], session=None) -> int:
+        """
+        Update AI analysis metadata for many procurements in one bulk_write
+
+        Args:
+            risk_scores: Risk score by procurement ID
+            session: Optional client session to run the updates in
+
+        Returns:
+            Number of procurements updated
+        """
+        operations = []
+        for procurement_id, risk_score in risk_scores.items():
+            obj_id = get_object_id(procurement_id)
+            if obj_id:
+                operations.append(UpdateOne({'_id': obj_id}, {'$set': self._ai_metadata_fields(risk_score)}))
+
+        if not operations:
+            return 0
+
+        result = self.collection.bulk_write(operations, ordered=False, session=session)
+
+        return result.modified_count
+
+    @staticmethod
+    def _ai_metadata_fields(risk_score: float) -> Dict:
+        """$set fields recording an AI analysis result"""
+        now = datetime.utcnow()
+
+        return {
+            'metadata.ai_analyzed': True,
+            'metadata.ai_analysis_date': now,
+            'metadata.risk_score': risk_score,
+            'metadata.has_anomalies': risk_score > 50,
+            'updated_at': now
+        }
+
     def get_by_category(self, category: str, limit: int = 100) -> List[Dict]:
         """
         Get procurement records by category
@@ -271,6 +305,28 @@ class ProcurementService:
 
         return serialize_document(list(records))
 
+    def get_by_categories(self, categories: List[str], limit: int = 100) -> Dict[str, List[Dict]]:
+        """
+        Get recent procurement records for several categories in one query
+
+        Args:
+            categories: Procurement categories
+            limit: Maximum results per category
+
+        Returns:
+            Records by category, newest published first (as get_by_category)
+        """
+        if not categories:
+            return {}
+
+        results = self.collection.aggregate([
+            {'$match': {'category': {'$in': list(categories)}, 'status': {'$ne': 'draft'}}},
+            {'$sort': {'published_date': -1}},
+            {'$group': {'_id': '$category', 'records': {'$firstN': {'input': '$$ROOT', 'n': limit}}}}
+        ], allowDiskUse=True)
+
+        return {result['_id']: serialize_document(result['records']) for result in results}
+
     def get_statistics(self) -> Dict:
         """
         Get procurement statistics
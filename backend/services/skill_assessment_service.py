@@ -1,5 +1,5 @@
 """Skill Assessment Service - handles assessment operations"""
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from bson import ObjectId
 from datetime import datetime
 from config.database import db
@@ -80,19 +80,25 @@ class SkillAssessmentService:
 
         return result.modified_count > 0
 
-    def analyze_with_ai(self, assessment_id: str, challenge_data: Dict = None) -> bool:
+    def analyze_with_ai(
+        self,
+        assessment_id: str,
+        challenge_data: Dict = None,
+        assessment_doc: Dict = None
+    ) -> bool:
         """
         Analyze submitted code using Gemini AI
 
         Args:
             assessment_id: Assessment ID
             challenge_data: Optional challenge data (prompt, test_cases)
+            assessment_doc: Optional already-loaded assessment (skips re-fetch)
 
         Returns:
             True if analysis successful
         """
-        # Get assessment
-        assessment = self.get_assessment_by_id(assessment_id)
+        # Get assessment (reuse the caller's copy when available)
+        assessment = assessment_doc or self.get_assessment_by_id(assessment_id)
 
         if not assessment:
             return False
@@ -208,7 +214,12 @@ class SkillAssessmentService:
 
         return verified_skills
 
-    def submit_assessment_code(self, assessment_id: str, code: str, time_taken: int) -> bool:
+    def submit_assessment_code(
+        self,
+        assessment_id: str,
+        code: str,
+        time_taken: int
+    ) -> Tuple[bool, Optional[Dict]]:
         """
         Submit code for an assessment
 
@@ -218,14 +229,14 @@ class SkillAssessmentService:
             time_taken: Time taken in seconds
 
         Returns:
-            True if submitted successfully
+            Tuple of (submitted successfully, updated assessment)
         """
         obj_id = get_object_id(assessment_id)
 
         if not obj_id:
-            return False
+            return False, None
 
-        result = self.collection.update_one(
+        result = self.collection.find_one_and_update(
             {'_id': obj_id},
             {
                 '$set': {
@@ -235,10 +246,14 @@ class SkillAssessmentService:
                     'status': 'grading',  # Change status to grading
                     'updated_at': datetime.utcnow()
                 }
-            }
+            },
+            return_document=True
         )
 
-        return result.modified_count > 0
+        if not result:
+            return False, None
+
+        return True, serialize_document(result)
 
     def update_ai_analysis(self, assessment_id: str, gemini_result: Dict) -> bool:
         """
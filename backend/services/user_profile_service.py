@@ -58,6 +58,46 @@ class UserProfileService:
 
         return str(result.inserted_id)
 
+    def create_profiles_bulk(self, user_type: str, docs: List[Dict]) -> List[str]:
+        """
+        Create many profiles of one type with a single insert_many
+
+        Each doc carries the profile schema inputs plus an optional 'extra'
+        dict of top-level fields, applied the same way update_profile would.
+
+        Args:
+            user_type: 'learner' or 'employer'
+            docs: Profile data dicts, each including 'user_id'
+
+        Returns:
+            Profile IDs in the same order as docs
+        """
+        if not docs:
+            return []
+
+        protected_fields = ['user_id', 'user_type', 'verified_skills', 'created_at']
+
+        profiles = []
+        for data in docs:
+            extra = data.pop('extra', None) or {}
+            data['user_id'] = get_object_id(data.get('user_id'))
+
+            if user_type == 'employer':
+                profile = UserProfileModel.create_employer_schema(data)
+            else:
+                profile = UserProfileModel.create_learner_schema(data)
+
+            profile.update({k: v for k, v in extra.items() if k not in protected_fields})
+
+            profile['metadata']['profile_completeness_score'] = UserProfileModel.calculate_profile_completeness(profile)
+            profile['metadata']['profile_complete'] = profile['metadata']['profile_completeness_score'] >= 80
+
+            profiles.append(profile)
+
+        result = self.collection.insert_many(profiles, ordered=False)
+
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+
     def get_profile_by_user_id(self, user_id: str) -> Optional[Dict]:
         """
         Get profile by user auth ID
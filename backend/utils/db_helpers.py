@@ -39,6 +39,36 @@ def serialize_document(doc: Any) -> Any:
     return serialized
 
 
+def serialize_cursor(cursor, batch_size: int = 500) -> List:
+    """
+    Serialize cursor results batch by batch
+
+    Each raw document is dropped once serialized, so only one batch of
+    raw documents is held alongside the output list.
+
+    Args:
+        cursor: PyMongo cursor
+        batch_size: Documents fetched per round trip
+
+    Returns:
+        List of JSON-serializable documents
+    """
+    return [serialize_document(doc) for doc in cursor.batch_size(batch_size)]
+
+
+def supports_transactions(client) -> bool:
+    """
+    Check whether the deployment accepts multi-document transactions
+
+    Args:
+        client: PyMongo MongoClient
+
+    Returns:
+        True for a replica set with a primary or a sharded cluster
+    """
+    return client.topology_description.topology_type_name in ('ReplicaSetWithPrimary', 'Sharded')
+
+
 def is_valid_object_id(id_str: str) -> bool:
     """
     Check if string is a valid MongoDB ObjectId
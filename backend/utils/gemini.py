@@ -0,0 +1,37 @@
+"""Shared Google Gemini client, configured on first use"""
+import threading
+from config.settings import get_config
+
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_model(model_name: str):
+    """
+    Get a Gemini model, importing and configuring google.generativeai once
+
+    genai.configure is process-global, so every service goes through here
+    instead of configuring it itself. Workers that never call Gemini don't
+    import the SDK at all.
+
+    Args:
+        model_name: Gemini model name
+
+    Returns:
+        Cached GenerativeModel for the name
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        if model_name not in _models:
+            import google.generativeai as genai
+
+            if not _models:
+                genai.configure(api_key=get_config().GEMINI_API_KEY)
+
+            _models[model_name] = genai.GenerativeModel(model_name)
+
+        return _models[model_name]